@@ -11,6 +11,8 @@ python -m scripts.create_db --s3
 import argparse
 import asyncio
 import logging
+from contextlib import AsyncExitStack
+from typing import Any, Coroutine
 
 import colorlogging
 
@@ -18,10 +20,20 @@ from www.crud.base.db import DBCrud
 from www.crud.base.s3 import create_s3_bucket
 from www.crud.robot import robot_crud
 from www.crud.robot_class import robot_class_crud
+from www.crud.unique_name import unique_name_crud
 
 logger = logging.getLogger(__name__)
 
-CRUDS: list[DBCrud] = [robot_class_crud, robot_crud]
+CRUDS: list[DBCrud] = [unique_name_crud, robot_class_crud, robot_crud]
+
+
+async def create_tables(cruds: list[DBCrud]) -> None:
+    # Creating tables is dominated by waiting on AWS, so do it concurrently.
+    await asyncio.gather(*(crud.create_table() for crud in cruds))
+
+    # Backfilling writes name sentinels into the unique-name table, so it
+    # only starts once every table (including that one) is active.
+    await asyncio.gather(*(crud.backfill_unique_names() for crud in cruds))
 
 
 async def main() -> None:
@@ -32,15 +44,18 @@ async def main() -> None:
     parser.add_argument("--db", action="store_true", help="Create the DynamoDB tables.")
     args = parser.parse_args()
 
-    if args.s3:
-        logger.info("Creating S3 bucket...")
-        await create_s3_bucket()
+    async with AsyncExitStack() as stack:
+        tasks: list[Coroutine[Any, Any, None]] = []
+        if args.s3:
+            logger.info("Creating S3 bucket...")
+            tasks.append(create_s3_bucket())
+
+        if args.db:
+            for crud in CRUDS:
+                await stack.enter_async_context(crud)
+            tasks.append(create_tables(CRUDS))
 
-    if args.db:
-        for crud in CRUDS:
-            async with crud:
-                logger.info("Creating %s table...", crud.table_name)
-                await crud.create_table()
+        await asyncio.gather(*tasks)
 
 
 if __name__ == "__main__":
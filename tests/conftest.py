@@ -4,6 +4,7 @@ import logging
 import os
 from typing import AsyncGenerator, Generator, cast
 
+import httpx
 import pytest
 from _pytest.python import Function
 from fastapi.testclient import TestClient
@@ -12,7 +13,12 @@ from httpx._transports.asgi import _ASGIApp
 from moto.server import ThreadedMotoServer
 from pytest_mock.plugin import AsyncMockType, MockerFixture, MockType
 
+from www.auth import _get_userinfo_endpoint, token_claims_cache, user_info_cache
 from www.crud import create
+from www.crud.base.s3 import S3Crud, s3_crud
+from www.crud.robot import robot_crud
+from www.crud.robot_class import RobotClassCrud, robot_class_crud
+from www.crud.unique_name import unique_name_crud
 
 os.environ["ENVIRONMENT"] = "local"
 
@@ -51,16 +57,43 @@ async def mock_aws() -> AsyncGenerator[None, None]:
 
     finally:
         if server is not None:
+            # Moto keeps its state in-process, so it's reset between tests.
+            host, port = server.get_host_and_port()
+            httpx.post(f"http://{host}:{port}/moto-api/reset")
             server.stop()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    # Moto is reset between tests, so nothing cached from an earlier test
+    # should be served in a later one.
+    robot_crud.clear_cache()
+    robot_class_crud.clear_cache()
+    token_claims_cache.clear()
+    user_info_cache.clear()
+    _get_userinfo_endpoint.cache_clear()
+
+
+@pytest.fixture()
+async def class_crud() -> AsyncGenerator[RobotClassCrud, None]:
+    async with robot_class_crud, unique_name_crud:
+        yield robot_class_crud
+
+
+@pytest.fixture()
+async def fs_crud() -> AsyncGenerator[S3Crud, None]:
+    async with s3_crud:
+        yield s3_crud
+
+
 @pytest.fixture()
 async def app_client() -> AsyncGenerator[AsyncClient, None]:
-    from www.main import app
+    from www.main import app, lifespan
 
     transport = ASGITransport(cast(_ASGIApp, app))
 
-    async with AsyncClient(transport=transport, base_url="http://test") as app_client:
+    # The transport doesn't send lifespan events, so the app is started here.
+    async with lifespan(app), AsyncClient(transport=transport, base_url="http://test") as app_client:
         yield app_client
 
 
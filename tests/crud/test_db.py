@@ -0,0 +1,36 @@
+"""Tests the DynamoDB CRUD helpers against mocked tables."""
+
+import asyncio
+from typing import Any
+
+from pytest_mock.plugin import MockerFixture
+
+from www.crud.robot_class import RobotClassCrud
+
+
+async def test_get_many_by_ids(class_crud: RobotClassCrud, mocker: MockerFixture) -> None:
+    ids = [f"item-{i:03d}" for i in range(250)]
+    await asyncio.gather(*(class_crud.table.put_item(Item={"id": id, "class_name": id}) for id in ids))
+
+    # The first request leaves most of its keys unprocessed, as DynamoDB does
+    # when it is throttling, so they have to be retried.
+    batch_get_item = class_crud.db.batch_get_item
+    requested: list[int] = []
+
+    async def flaky_batch_get_item(RequestItems: dict[str, Any]) -> dict[str, Any]:  # noqa: N803
+        (table_name, request), *_ = RequestItems.items()
+        requested.append(len(keys := request["Keys"]))
+        if len(requested) > 1:
+            return dict(await batch_get_item(RequestItems=RequestItems))
+        response = await batch_get_item(RequestItems={table_name: {"Keys": keys[:10]}})
+        return {**response, "UnprocessedKeys": {table_name: {"Keys": keys[10:]}}}
+
+    mocker.patch.object(class_crud.db, "batch_get_item", new=flaky_batch_get_item)
+
+    # Requests are split into chunks of at most 100 keys, and duplicate or
+    # missing IDs are handled.
+    requested_ids = [*reversed(ids), ids[0], "missing"]
+    items = await class_crud.get_many_by_ids(requested_ids)
+    assert sorted(requested) == [51, 90, 100, 100]
+    assert [items[id]["id"] for id in requested_ids if id in items] == [*reversed(ids), ids[0]]
+    assert "missing" not in items
@@ -0,0 +1,23 @@
+"""Tests that models built without validation match validated ones."""
+
+from pytest_mock.plugin import MockerFixture
+
+from www.crud.robot import Robot, robot_crud
+from www.crud.robot_class import RobotClass, RobotClassCrud
+from www.crud.unique_name import unique_name_crud
+
+
+async def test_add_robot_construct(mocker: MockerFixture) -> None:
+    construct = mocker.spy(Robot, "model_construct")
+    async with robot_crud, unique_name_crud:
+        robot = await robot_crud.add_robot("construct_test", "user", "class")
+
+    # Validating the same inputs gives the same robot, so a new required
+    # field or default can't silently skip validation.
+    assert Robot.model_validate(construct.call_args.kwargs) == robot
+
+
+async def test_add_robot_class_construct(class_crud: RobotClassCrud, mocker: MockerFixture) -> None:
+    construct = mocker.spy(RobotClass, "model_construct")
+    robot_class = await class_crud.add_robot_class("construct_test", "user")
+    assert RobotClass.model_validate(construct.call_args.kwargs) == robot_class
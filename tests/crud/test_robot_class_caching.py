@@ -0,0 +1,40 @@
+"""Tests that writes to robot classes are visible through the caches."""
+
+from www.crud.robot_class import RobotClassCrud
+
+
+async def test_downloads_invalidate_lookups(class_crud: RobotClassCrud) -> None:
+    robot_class = await class_crud.add_robot_class("cached_downloads", "user")
+
+    # Populates the caches.
+    assert (by_id := await class_crud.get_robot_class_by_id(robot_class.id)) is not None
+    assert (by_name := await class_crud.get_robot_class_by_name("cached_downloads")) is not None
+    assert by_id.num_downloads == by_name.num_downloads == 0
+
+    await class_crud.increment_downloads(robot_class)
+    assert (by_id := await class_crud.get_robot_class_by_id(robot_class.id)) is not None
+    assert (by_name := await class_crud.get_robot_class_by_name("cached_downloads")) is not None
+    assert by_id.num_downloads == by_name.num_downloads == 1
+
+
+async def test_writes_invalidate_listings(class_crud: RobotClassCrud) -> None:
+    async def listed() -> dict[str | None, list[tuple[str, int]]]:
+        return {
+            user_id: [(rc.class_name, rc.num_downloads) for rc in await class_crud.list_robot_classes(user_id)]
+            for user_id in (None, "user")
+        }
+
+    # Populates the cached listings.
+    assert await listed() == {None: [], "user": []}
+
+    robot_class = await class_crud.add_robot_class("cached_list", "user")
+    assert await listed() == {None: [("cached_list", 0)], "user": [("cached_list", 0)]}
+
+    robot_class = await class_crud.update_robot_class(robot_class, new_class_name="cached_list_renamed")
+    assert await listed() == {None: [("cached_list_renamed", 0)], "user": [("cached_list_renamed", 0)]}
+
+    await class_crud.increment_downloads(robot_class)
+    assert await listed() == {None: [("cached_list_renamed", 1)], "user": [("cached_list_renamed", 1)]}
+
+    await class_crud.delete_robot_class(robot_class)
+    assert await listed() == {None: [], "user": []}
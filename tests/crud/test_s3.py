@@ -0,0 +1,106 @@
+"""Tests the S3 CRUD helpers against a mocked bucket."""
+
+import io
+from typing import AsyncIterator
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from aiobotocore.credentials import AioCredentials
+from botocore.exceptions import ClientError
+from pytest_mock.plugin import MockerFixture
+
+from www.crud.base.client import SESSION
+from www.crud.base.s3 import S3Crud
+from www.settings import env
+
+MIB = 1024 * 1024
+
+
+async def read(fs_crud: S3Crud, filename: str) -> bytes:
+    body = await fs_crud.download_from_s3(filename)
+    async with body:
+        return await body.read()
+
+
+async def chunked(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), chunk_size):
+        yield data[i : i + chunk_size]
+
+
+async def test_upload_stream(fs_crud: S3Crud) -> None:
+    # Chunks are regrouped into three parts, the last one smaller.
+    data = bytes(range(256)) * (11 * MIB // 256 + 1)
+    await fs_crud.upload_stream(chunked(data, MIB), "data.bin", "stream.bin", "application/octet-stream", concurrency=2)
+    assert await read(fs_crud, "stream.bin") == data
+
+
+async def test_upload_stream_abort(fs_crud: S3Crud, mocker: MockerFixture) -> None:
+    error = ClientError({"Error": {"Code": "InternalError", "Message": "Part failed"}}, "UploadPart")
+    mocker.patch.object(fs_crud.client, "upload_part", side_effect=error)
+
+    # The underlying error is raised, rather than the task group's wrapper.
+    with pytest.raises(ClientError) as exc_info:
+        await fs_crud.upload_stream(chunked(b"data", 2), "data.bin", "aborted.bin", "application/octet-stream")
+    assert exc_info.value is error
+
+    # The multipart upload was aborted, so nothing is left behind.
+    uploads = await fs_crud.client.list_multipart_uploads(Bucket=env.aws.s3.bucket)
+    assert uploads.get("Uploads", []) == []
+    assert await fs_crud.get_file_size("aborted.bin") is None
+
+
+async def test_download_ranged(fs_crud: S3Crud) -> None:
+    data = bytes(range(10))
+    await fs_crud.upload_to_s3(io.BytesIO(data), "data.bin", "ranged.bin", "application/octet-stream")
+
+    # Fetched as four ranges, the last one partial, with two in flight at once.
+    parts = [part async for part in fs_crud.download_ranged("ranged.bin", part_size=3, concurrency=2)]
+    assert parts == [data[0:3], data[3:6], data[6:9], data[9:10]]
+
+    # An object smaller than one range is fetched with a single request.
+    parts = [part async for part in fs_crud.download_ranged("ranged.bin")]
+    assert parts == [data]
+
+
+async def test_delete_many_from_s3(fs_crud: S3Crud) -> None:
+    for filename in ("a.bin", "b.bin"):
+        await fs_crud.upload_to_s3(io.BytesIO(b"data"), filename, filename, "application/octet-stream")
+
+    # Missing keys aren't treated as errors.
+    await fs_crud.delete_many_from_s3(["a.bin", "b.bin", "missing.bin"])
+    assert await fs_crud.get_file_size("a.bin") is None
+    assert await fs_crud.get_file_size("b.bin") is None
+
+
+async def test_delete_many_from_s3_errors(fs_crud: S3Crud, mocker: MockerFixture) -> None:
+    delete_objects = mocker.patch.object(
+        fs_crud.bucket,
+        "delete_objects",
+        new=mocker.AsyncMock(return_value={"Errors": [{"Key": "a.bin", "Code": "AccessDenied", "Message": "Denied"}]}),
+    )
+
+    # Keys are sent in batches of at most 1000, and failed keys are raised.
+    with pytest.raises(RuntimeError):
+        await fs_crud.delete_many_from_s3([f"{i}.bin" for i in range(1001)])
+    assert [len(call.kwargs["Delete"]["Objects"]) for call in delete_objects.call_args_list] == [1000, 1]
+
+
+def access_key(url: str) -> str:
+    query = parse_qs(urlsplit(url).query)
+    if "X-Amz-Credential" in query:
+        return query["X-Amz-Credential"][0].split("/")[0]
+    return query["AWSAccessKeyId"][0]
+
+
+async def test_presign_credentials_refresh(fs_crud: S3Crud, mocker: MockerFixture) -> None:
+    # URLs are signed with the shared session's credentials.
+    url = await fs_crud.generate_presigned_download_url("file.bin")
+    assert access_key(url) == "test"
+
+    # When the session's credentials are refreshed, the new ones are used.
+    async def get_credentials() -> AioCredentials:
+        return AioCredentials("rotated", "secret")
+
+    mocker.patch.object(SESSION, "get_credentials", get_credentials)
+    url = await fs_crud.generate_presigned_download_url("file.bin")
+    assert access_key(url) == "rotated"
@@ -0,0 +1,82 @@
+"""Tests that unique names are claimed and released with their items."""
+
+import logging
+
+import pytest
+
+from www.crud.robot_class import RobotClassCrud
+from www.crud.unique_name import unique_name_crud
+
+
+async def get_owner(class_name: str) -> object:
+    response = await unique_name_crud.table.get_item(Key={"id": f"robot-class:{class_name}"})
+    return None if (item := response.get("Item")) is None else item["item_id"]
+
+
+async def test_unique_names(class_crud: RobotClassCrud) -> None:
+    # Adding a robot class claims its name.
+    robot_class = await class_crud.add_robot_class("unique_a", "user")
+    assert await get_owner("unique_a") == robot_class.id
+    with pytest.raises(ValueError):
+        await class_crud.add_robot_class("unique_a", "other_user")
+
+    # Renaming moves the claim and releases the old name.
+    robot_class = await class_crud.update_robot_class(robot_class, new_class_name="unique_b")
+    assert await get_owner("unique_a") is None
+    assert await get_owner("unique_b") == robot_class.id
+
+    # Renaming to a name which is already taken leaves everything unchanged.
+    other_class = await class_crud.add_robot_class("unique_a", "other_user")
+    with pytest.raises(ValueError):
+        await class_crud.update_robot_class(robot_class, new_class_name="unique_a")
+    assert await get_owner("unique_a") == other_class.id
+    assert await get_owner("unique_b") == robot_class.id
+    assert (existing := await class_crud.get_robot_class_by_id(robot_class.id)) is not None
+    assert existing.class_name == "unique_b"
+
+    # Deleting releases the name.
+    await class_crud.delete_robot_class(robot_class)
+    assert await get_owner("unique_b") is None
+    assert await get_owner("unique_a") == other_class.id
+
+
+async def test_backfill_unique_names(class_crud: RobotClassCrud, caplog: pytest.LogCaptureFixture) -> None:
+    # Items written before unique names were enforced have no sentinel.
+    await class_crud.table.put_item(Item={"id": "legacy", "class_name": "legacy_a", "description": "", "user_id": "u"})
+    await class_crud.table.put_item(Item={"id": "clash", "class_name": "legacy_b", "description": "", "user_id": "u"})
+    await unique_name_crud.table.put_item(Item={"id": "robot-class:legacy_b", "item_id": "other"})
+
+    with caplog.at_level(logging.WARNING, logger="www.crud.base.db"):
+        await class_crud.backfill_unique_names()
+    assert await get_owner("legacy_a") == "legacy"
+    assert await get_owner("legacy_b") == "other"
+    assert [r.getMessage() for r in caplog.records if r.name == "www.crud.base.db"] == [
+        "Name of item clash in www-local-robot-class is already claimed"
+    ]
+
+    # Rerunning the backfill doesn't treat an item's own name as a conflict.
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="www.crud.base.db"):
+        await class_crud.backfill_unique_names()
+    assert [r.getMessage() for r in caplog.records if r.name == "www.crud.base.db"] == [
+        "Name of item clash in www-local-robot-class is already claimed"
+    ]
+
+
+async def test_legacy_item_keeps_other_claim(class_crud: RobotClassCrud) -> None:
+    # A legacy item whose name was claimed by another item during the backfill.
+    await class_crud.table.put_item(Item={"id": "clash", "class_name": "legacy_c", "description": "", "user_id": "u"})
+    await unique_name_crud.table.put_item(Item={"id": "robot-class:legacy_c", "item_id": "other"})
+    assert (legacy := await class_crud.get_robot_class_by_id("clash")) is not None
+
+    # Renaming it claims the new name without releasing the other item's claim.
+    legacy = await class_crud.update_robot_class(legacy, new_class_name="legacy_d")
+    assert await get_owner("legacy_c") == "other"
+    assert await get_owner("legacy_d") == "clash"
+
+    # Deleting an item which never claimed its name leaves the claim alone.
+    await class_crud.table.put_item(Item={"id": "clash2", "class_name": "legacy_c", "description": "", "user_id": "u"})
+    assert (legacy := await class_crud.get_robot_class_by_id("clash2")) is not None
+    await class_crud.delete_robot_class(legacy)
+    assert await get_owner("legacy_c") == "other"
+    assert await class_crud.get_robot_class_by_id("clash2") is None
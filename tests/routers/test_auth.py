@@ -1,8 +1,9 @@
 """Tests for the auth router."""
 
 import pytest
-from fastapi import status
+from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from pytest_mock.plugin import AsyncMockType
 
 HEADERS = {"Authorization": "Bearer test"}
 
@@ -45,6 +46,21 @@ async def test_profile_endpoint(test_client: TestClient) -> None:
     }
 
 
+@pytest.mark.asyncio
+async def test_profile_endpoint_invalid_token(
+    test_client: TestClient,
+    mock_get_user: AsyncMockType,
+    mock_get_user_info: AsyncMockType,
+) -> None:
+    mock_get_user.side_effect = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # The userinfo isn't fetched or saved to the session for a rejected token.
+    response = test_client.get("/auth/profile", headers=HEADERS)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+    mock_get_user_info.assert_not_called()
+    assert "set-cookie" not in response.headers
+
+
 @pytest.mark.asyncio
 async def test_logout_endpoint(test_client: TestClient) -> None:
     response = test_client.get("/auth/logout", headers=HEADERS)
@@ -63,6 +63,14 @@ async def test_robots(test_client: TestClient) -> None:
     )
     assert response.status_code == status.HTTP_200_OK, response.text
 
+    # Attempts to rename the first robot to the name of the second robot
+    response = test_client.post(
+        "/robot/test_robot",
+        json={"new_robot_name": "other_robot"},
+        headers=HEADERS,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
     # Updates the first robot
     response = test_client.post(
         "/robot/test_robot",
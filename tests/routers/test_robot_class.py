@@ -6,6 +6,9 @@ import httpx
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
+from pytest_mock.plugin import MockerFixture
+
+from www.crud.base.s3 import S3Crud
 
 HEADERS = {"Authorization": "Bearer test"}
 
@@ -135,3 +138,60 @@ async def test_urdf(test_client: TestClient) -> None:
     # Check that the URDF is deleted.
     response = test_client.get("/robots/urdf/test", headers=HEADERS)
     assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+@pytest.mark.asyncio
+async def test_robot_class_non_finite_metadata(test_client: TestClient) -> None:
+    response = test_client.put("/robots/nan_test", json={"description": "Test description"}, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    # NaN and infinite values can't be stored in DynamoDB, so they are rejected.
+    for value in ("NaN", "Infinity", "-Infinity"):
+        response = test_client.post(
+            "/robots/nan_test",
+            content=f'{{"new_metadata": {{"joint_name_to_metadata": {{"joint1": {{"kp": {value}}}}}}}}}',
+            headers={**HEADERS, "Content-Type": "application/json"},
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, response.text
+
+
+@pytest.mark.asyncio
+async def test_delete_robot_class_s3_failure(test_client: TestClient, mocker: MockerFixture) -> None:
+    response = test_client.put("/robots/s3_failure_test", json={"description": "Test description"}, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    # Failing to clean up the URDF doesn't leave the robot class behind.
+    mocker.patch.object(S3Crud, "delete_from_s3", side_effect=RuntimeError("Failed to delete"))
+    response = test_client.delete("/robots/s3_failure_test", headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = test_client.get("/robots/name/s3_failure_test", headers=HEADERS)
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+@pytest.mark.asyncio
+async def test_robot_class_metadata_wire_format(test_client: TestClient) -> None:
+    response = test_client.put("/robots/format_test", json={"description": "Test description"}, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = test_client.post(
+        "/robots/format_test",
+        json={
+            "new_metadata": {
+                "joint_name_to_metadata": {"joint1": {"kp": 1.5, "min_angle_deg": -90}},
+                "control_frequency": 50,
+            },
+        },
+        headers=HEADERS,
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    # All metadata numbers are serialized as decimal strings.
+    for path in ("/robots/name/format_test", "/robots/"):
+        response = test_client.get(path, headers=HEADERS)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        data = response.json()
+        metadata = (data[0] if isinstance(data, list) else data)["metadata"]
+        assert metadata["joint_name_to_metadata"]["joint1"]["kp"] == "1.5"
+        assert metadata["joint_name_to_metadata"]["joint1"]["min_angle_deg"] == "-90"
+        assert metadata["control_frequency"] == "50"
@@ -0,0 +1,137 @@
+"""Tests caching of decoded tokens and userinfo responses."""
+
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from pytest_mock.plugin import MockerFixture, MockType
+
+from www.auth import (
+    TOKEN_CACHE_SECONDS,
+    USER_INFO_CACHE_SECONDS,
+    USERINFO_ENDPOINT_CACHE_SECONDS,
+    UserInfo,
+    _decode_token_claims,
+    _decode_user_info_from_token,  # Bound before the conftest mocks it.
+    token_claims_cache,
+)
+
+NOW = 1_000_000.0
+
+
+class Clock:
+    """Stands in for the clocks read by the caches."""
+
+    def __init__(self) -> None:
+        self.now = NOW
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def datetime_now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.now)
+
+
+@pytest.fixture()
+def clock(mocker: MockerFixture) -> Clock:
+    clock = Clock()
+    mocker.patch("www.utils.caching.time", SimpleNamespace(monotonic=clock.monotonic))
+    mocker.patch("www.auth.time", SimpleNamespace(time=clock.time))
+    mocker.patch(
+        "www.utils.caching.datetime",
+        SimpleNamespace(datetime=SimpleNamespace(now=clock.datetime_now)),
+    )
+    return clock
+
+
+@pytest.fixture()
+def verify_token(mocker: MockerFixture) -> MockType:
+    return mocker.patch("www.auth._verify_token")
+
+
+@pytest.mark.asyncio
+async def test_token_claims_cached(clock: Clock, verify_token: MockType) -> None:
+    verify_token.return_value = {"sub": "user", "exp": NOW + 3600}
+    assert await _decode_token_claims("token") == {"sub": "user", "exp": NOW + 3600}
+    assert await _decode_token_claims("token") == {"sub": "user", "exp": NOW + 3600}
+    assert verify_token.call_count == 1
+
+    # Entries expire after the cache TTL.
+    clock.now += TOKEN_CACHE_SECONDS + 1
+    await _decode_token_claims("token")
+    assert verify_token.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_token_claims_ttl_capped_by_exp(clock: Clock, verify_token: MockType) -> None:
+    # A token which expires before the cache TTL is only cached until then.
+    verify_token.return_value = {"sub": "user", "exp": NOW + 10}
+    await _decode_token_claims("token")
+    clock.now += 5
+    await _decode_token_claims("token")
+    assert verify_token.call_count == 1
+    clock.now += 6
+    await _decode_token_claims("token")
+    assert verify_token.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_token_claims_not_cached(clock: Clock, verify_token: MockType) -> None:
+    verify_token.return_value = {"sub": "user", "exp": NOW - 1}
+    await _decode_token_claims("token")
+    await _decode_token_claims("token")
+    assert verify_token.call_count == 2
+    assert len(token_claims_cache) == 0
+
+
+class FakeAsyncClient:
+    """Answers the OIDC metadata and userinfo requests, counting them."""
+
+    requests: list[str] = []
+
+    async def __aenter__(self) -> "FakeAsyncClient":
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        pass
+
+    async def get(self, url: str, headers: dict[str, str] | None = None) -> SimpleNamespace:
+        if url.endswith("openid-configuration"):
+            self.requests.append("metadata")
+            return SimpleNamespace(json=lambda: {"userinfo_endpoint": "https://example.com/userinfo"})
+        self.requests.append("userinfo")
+        return SimpleNamespace(json=lambda: {"email": "test@example.com", "email_verified": "true"})
+
+
+@pytest.fixture()
+def http_requests(mocker: MockerFixture) -> list[str]:
+    requests: list[str] = []
+    mocker.patch.object(FakeAsyncClient, "requests", requests)
+    mocker.patch("www.auth.AsyncClient", FakeAsyncClient)
+    return requests
+
+
+USER_INFO = UserInfo(email="test@example.com", email_verified=True)
+
+
+@pytest.mark.asyncio
+async def test_user_info_cached(clock: Clock, http_requests: list[str]) -> None:
+    assert await _decode_user_info_from_token("token") == USER_INFO
+    assert http_requests == ["metadata", "userinfo"]
+
+    # A cache hit doesn't make any requests.
+    assert await _decode_user_info_from_token("token") == USER_INFO
+    assert http_requests == ["metadata", "userinfo"]
+
+    # The userinfo expires after a minute, but the endpoint is still cached.
+    clock.now += USER_INFO_CACHE_SECONDS + 1
+    assert await _decode_user_info_from_token("token") == USER_INFO
+    assert http_requests == ["metadata", "userinfo", "userinfo"]
+
+    # The endpoint expires after an hour.
+    clock.now += USERINFO_ENDPOINT_CACHE_SECONDS
+    assert await _decode_user_info_from_token("token") == USER_INFO
+    assert http_requests == ["metadata", "userinfo", "userinfo", "metadata", "userinfo"]
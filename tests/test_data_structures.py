@@ -1,6 +1,8 @@
 """Tests some common shared data structures."""
 
-from www.utils.caching import LRUCache
+import time
+
+from www.utils.caching import LRUCache, TTLCache
 
 
 def test_lru_cache() -> None:
@@ -18,3 +20,18 @@ def test_lru_cache() -> None:
     assert cache.get(1) == "one"
     assert cache.get(3) == "three"
     assert cache.get(4) == "four"
+
+
+def test_ttl_cache() -> None:
+    cache = TTLCache[int, str](3, ttl=60.0)
+    cache.put(1, "one")
+    cache.put(2, "two", ttl=0.0)
+    time.sleep(0.01)
+    assert cache.get(1) == "one"
+    assert cache.get(2) is None
+    assert 2 not in cache
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    cache.put(3, "three")
+    cache.clear()
+    assert len(cache) == 0
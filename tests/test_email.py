@@ -0,0 +1,177 @@
+"""Tests sending emails through the pooled SMTP connection."""
+
+from typing import Generator
+
+import aiosmtplib
+import pytest
+from pytest_mock.plugin import MockerFixture
+
+import www.utils.email
+from www.utils.email import SMTPPool, send_email  # Bound before the conftest mocks it.
+
+
+class FakeSMTP:
+    """Records the commands sent to it, and can fail on a chosen command."""
+
+    def __init__(self, fail_on: str | None = None) -> None:
+        self.fail_on = fail_on
+        self.is_connected = True
+        self.closed = False
+        self.sent: list[str] = []
+
+    def _command(self, name: str) -> None:
+        if not self.is_connected:
+            raise aiosmtplib.SMTPServerDisconnected("Not connected")
+        if name == self.fail_on:
+            self.is_connected = False
+            raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+
+    async def noop(self) -> None:
+        self._command("noop")
+
+    async def quit(self) -> None:
+        self._command("quit")
+        self.is_connected = False
+
+    def close(self) -> None:
+        self.closed = True
+        self.is_connected = False
+
+
+@pytest.fixture()
+def smtp_clients(mocker: MockerFixture) -> Generator[list[FakeSMTP], None, None]:
+    clients: list[FakeSMTP] = []
+
+    async def connect(self: SMTPPool) -> FakeSMTP:
+        clients.append(client := FakeSMTP())
+        return client
+
+    mocker.patch.object(SMTPPool, "_connect", connect)
+    yield clients
+
+
+async def test_pool_reuses_connection(smtp_clients: list[FakeSMTP]) -> None:
+    pool = SMTPPool()
+    async with pool.acquire() as first:
+        pass
+    async with pool.acquire() as second:
+        pass
+    assert first is second
+    assert len(smtp_clients) == 1
+
+
+async def test_pool_replaces_dead_idle_connection(
+    smtp_clients: list[FakeSMTP],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pool = SMTPPool()
+    async with pool.acquire():
+        pass
+
+    # An idle connection is checked with NOOP, and when that fails the old
+    # connection is closed before a new one is opened.
+    monkeypatch.setattr(www.utils.email, "SMTP_KEEPALIVE_SECONDS", 0)
+    smtp_clients[0].fail_on = "noop"
+    async with pool.acquire():
+        pass
+    assert len(smtp_clients) == 2
+    assert smtp_clients[0].closed
+
+    await pool.close()
+    assert not smtp_clients[1].is_connected
+
+
+class FakeSendingSMTP(FakeSMTP):
+    """Also records the messages which were delivered."""
+
+    def __init__(self, fail_on: str | None = None) -> None:
+        super().__init__(fail_on)
+        self.delivered: list[str] = []
+        self.refused: set[str] = set()
+
+    async def mail(self, sender: str) -> None:
+        self._command("mail")
+
+    async def rcpt(self, recipient: str) -> None:
+        self._command("rcpt")
+        if recipient in self.refused:
+            raise aiosmtplib.SMTPRecipientRefused(550, "No such user", recipient)
+
+    async def data(self, message: str) -> None:
+        self._command("data")
+        self.delivered.append(message)
+
+    async def rset(self) -> None:
+        self._command("rset")
+
+
+@pytest.fixture()
+def sending_clients(
+    mocker: MockerFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[list[FakeSendingSMTP], None, None]:
+    monkeypatch.setenv("SMTP_SENDER_EMAIL", "sender@example.com")
+    monkeypatch.setenv("SMTP_SENDER_NAME", "Sender")
+    clients: list[FakeSendingSMTP] = []
+
+    async def connect(self: SMTPPool) -> FakeSendingSMTP:
+        clients.append(client := FakeSendingSMTP())
+        return client
+
+    mocker.patch.object(SMTPPool, "_connect", connect)
+    mocker.patch.object(www.utils.email, "smtp_pool", SMTPPool())
+    yield clients
+
+
+async def test_send_emails_one_session(sending_clients: list[FakeSendingSMTP]) -> None:
+    failures = await www.utils.email.send_emails([("Subject", "Body", f"user{i}@example.com") for i in range(3)])
+    assert failures == []
+    assert len(sending_clients) == 1
+    assert len(sending_clients[0].delivered) == 3
+
+
+async def test_send_emails_retries_before_data(sending_clients: list[FakeSendingSMTP]) -> None:
+    await www.utils.email.send_emails([("Subject", "Body", "user@example.com")])
+
+    # The server drops the pooled connection before the message is sent, so
+    # it is sent exactly once on a new connection.
+    sending_clients[0].fail_on = "mail"
+    assert await www.utils.email.send_emails([("Subject", "Body", "user@example.com")]) == []
+    assert len(sending_clients) == 2
+    assert len(sending_clients[0].delivered) == 1
+    assert len(sending_clients[1].delivered) == 1
+    assert sending_clients[0].closed
+
+
+async def test_send_emails_does_not_retry_during_data(sending_clients: list[FakeSendingSMTP]) -> None:
+    await www.utils.email.send_emails([("Subject", "Body", "user@example.com")])
+
+    # The server may have accepted the first message before the connection
+    # dropped, so it is reported as failed rather than resent, and the rest
+    # of the batch is sent on a new connection.
+    sending_clients[0].fail_on = "data"
+    failures = await www.utils.email.send_emails(
+        [("Subject", "Body", "user@example.com"), ("Subject", "Body", "other@example.com")]
+    )
+    assert [(to, type(e)) for to, e in failures] == [("user@example.com", aiosmtplib.SMTPServerDisconnected)]
+    assert len(sending_clients) == 2
+    assert len(sending_clients[0].delivered) == 1
+    assert len(sending_clients[1].delivered) == 1
+
+
+async def test_send_emails_refused_recipient(sending_clients: list[FakeSendingSMTP]) -> None:
+    async with www.utils.email.smtp_pool.acquire():
+        pass
+    sending_clients[0].refused.add("bad@example.com")
+
+    # A refused recipient doesn't stop the rest of the batch.
+    failures = await www.utils.email.send_emails(
+        [("Subject", "Body", to) for to in ("a@example.com", "bad@example.com", "b@example.com")]
+    )
+    assert [(to, type(e)) for to, e in failures] == [("bad@example.com", aiosmtplib.SMTPRecipientRefused)]
+    assert len(sending_clients) == 1
+    assert len(sending_clients[0].delivered) == 2
+
+    # Sending a single email raises the error.
+    with pytest.raises(aiosmtplib.SMTPRecipientRefused):
+        await send_email("Subject", "Body", "bad@example.com")
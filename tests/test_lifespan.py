@@ -0,0 +1,28 @@
+"""Tests that the shared CRUDs stay usable while the app is running."""
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from www.crud.base.s3 import s3_crud
+from www.crud.robot_class import robot_class_crud
+
+HEADERS = {"Authorization": "Bearer test"}
+
+
+@pytest.mark.asyncio
+async def test_crud_context_during_lifespan(app_client: AsyncClient) -> None:
+    # Using the CRUDs as context managers shouldn't close the clients which
+    # the app's lifespan opened.
+    async with robot_class_crud, s3_crud:
+        pass
+
+    response = await app_client.put("/robots/lifespan_test", json={}, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = await app_client.put(
+        "/robots/urdf/lifespan_test",
+        json={"filename": "robot.tgz", "content_type": "application/x-compressed-tar"},
+        headers=HEADERS,
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
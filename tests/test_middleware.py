@@ -0,0 +1,90 @@
+"""Tests the session cookie round-trip through the session middleware."""
+
+from base64 import b64encode
+from typing import AsyncGenerator
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from itsdangerous import TimestampSigner
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from www.middleware import ORJSONSessionMiddleware
+
+COOKIE = "session"
+
+
+async def get_session(request: Request) -> JSONResponse:
+    return JSONResponse(dict(request.session))
+
+
+async def set_session(request: Request) -> JSONResponse:
+    request.session.update(await request.json())
+    return JSONResponse(dict(request.session))
+
+
+async def clear_session(request: Request) -> JSONResponse:
+    request.session.clear()
+    return JSONResponse(dict(request.session))
+
+
+@pytest.fixture()
+async def client() -> AsyncGenerator[AsyncClient, None]:
+    app = Starlette(
+        routes=[
+            Route("/", get_session),
+            Route("/set", set_session, methods=["POST"]),
+            Route("/clear", clear_session, methods=["POST"]),
+        ],
+        middleware=[Middleware(ORJSONSessionMiddleware, secret_key="test")],
+    )
+    async with AsyncClient(transport=ASGITransport(app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_session_round_trip(client: AsyncClient) -> None:
+    # Sets a value on a new session.
+    response = await client.post("/set", json={"user": "a"})
+    assert COOKIE in response.cookies
+    assert (await client.get("/")).json() == {"user": "a"}
+
+    # Reading the session doesn't re-sign the cookie.
+    response = await client.get("/")
+    assert "set-cookie" not in response.headers
+
+    # Modifying the session updates the cookie.
+    response = await client.post("/set", json={"user": "b", "n": 1})
+    assert COOKIE in response.cookies
+    assert (await client.get("/")).json() == {"user": "b", "n": 1}
+
+    # Clearing the session expires the cookie.
+    response = await client.post("/clear")
+    assert "expires=Thu, 01 Jan 1970 00:00:00 GMT" in response.headers["set-cookie"]
+    assert COOKIE not in client.cookies
+    assert (await client.get("/")).json() == {}
+
+
+@pytest.mark.asyncio
+async def test_session_tampered_cookie(client: AsyncClient) -> None:
+    response = await client.post("/set", json={"user": "a"})
+    cookie = response.cookies[COOKIE]
+    client.cookies.clear()
+
+    # A cookie whose payload was changed fails the signature check, and the
+    # request gets an empty session.
+    payload, signature = cookie.split(".", 1)
+    client.cookies.set(COOKIE, payload[:-2] + "xx." + signature)
+    assert (await client.get("/")).json() == {}
+
+    # So does a cookie which isn't signed at all.
+    client.cookies.set(COOKIE, "garbage")
+    assert (await client.get("/")).json() == {}
+
+    # A correctly signed cookie which doesn't hold JSON is also ignored.
+    signed = TimestampSigner("test").sign(b64encode(b"not json")).decode("utf-8")
+    client.cookies.set(COOKIE, signed)
+    assert (await client.get("/")).json() == {}
@@ -1,7 +1,11 @@
 """Defines authentication functionality."""
 
+import asyncio
 import datetime
+import hashlib
 import logging
+import time
+from dataclasses import asdict, dataclass
 from typing import Annotated, Any, Callable, Coroutine, Literal
 
 from fastapi import Depends, Request, Security, status
@@ -9,9 +13,9 @@ from fastapi.exceptions import HTTPException
 from fastapi.security import APIKeyHeader, OpenIdConnect, SecurityScopes
 from httpx import AsyncClient
 from jwt import DecodeError, InvalidTokenError, PyJWKClient, decode as jwt_decode, encode as jwt_encode
-from pydantic.main import BaseModel
 
 from www.settings import env
+from www.utils.caching import TTLCache, cache_async_result
 
 logger = logging.getLogger(__name__)
 
@@ -36,19 +40,33 @@ api_key = APIKeyHeader(
 
 jwks = PyJWKClient(JWKS_URL)
 
+# Decoded token claims are cached so that repeated requests with the same
+# token can skip the RSA signature verification.
+TOKEN_CACHE_SECONDS = 300
+token_claims_cache = TTLCache[bytes, dict[str, Any]](capacity=20_000, ttl=TOKEN_CACHE_SECONDS)
 
-class User(BaseModel):
+
+@dataclass(frozen=True, slots=True)
+class User:
     id: str
     is_admin: bool
     can_upload: bool
     can_test: bool
 
 
-class UserInfo(BaseModel):
+@dataclass(frozen=True, slots=True)
+class UserInfo:
     email: str
     email_verified: bool
 
 
+# The OIDC metadata rarely changes, and the userinfo for a token is cached
+# briefly so that repeated profile requests don't each call Cognito.
+USERINFO_ENDPOINT_CACHE_SECONDS = 3600
+USER_INFO_CACHE_SECONDS = 60
+user_info_cache = TTLCache[bytes, UserInfo](capacity=20_000, ttl=USER_INFO_CACHE_SECONDS)
+
+
 def encode_api_key(user: User, user_info: UserInfo, exp_delta: datetime.timedelta) -> str:
     """Returns a new API key for a user.
 
@@ -115,7 +133,36 @@ def _decode_user_info_from_api_key(api_key: str) -> tuple[User, UserInfo]:
     return user, user_info
 
 
-def _decode_user_from_token(token: str) -> User:
+def _verify_token(token_str: str) -> dict[str, Any]:
+    # Get the signing key that matches the token
+    signing_key = jwks.get_signing_key_from_jwt(token_str)
+
+    return jwt_decode(
+        token_str,
+        signing_key.key,
+        algorithms=["RS256"],
+        options={"verify_aud": False},
+    )
+
+
+async def _decode_token_claims(token_str: str) -> dict[str, Any]:
+    cache_key = hashlib.blake2b(token_str.encode(), digest_size=16).digest()
+    if (claims := token_claims_cache.get(cache_key)) is not None:
+        return claims
+
+    # Fetching the JWKS and verifying the RSA signature are both blocking, so
+    # they are run in a worker thread to avoid stalling the event loop.
+    claims = await asyncio.to_thread(_verify_token, token_str)
+
+    # Don't keep the claims around for longer than the token is valid.
+    ttl = min(TOKEN_CACHE_SECONDS, claims["exp"] - time.time()) if "exp" in claims else TOKEN_CACHE_SECONDS
+    if ttl > 0:
+        token_claims_cache.put(cache_key, claims, ttl=ttl)
+
+    return claims
+
+
+async def _decode_user_from_token(token: str) -> User:
     # Validates that the token is in the correct format.
     token_parts = token.split(" ")
     if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
@@ -126,16 +173,7 @@ def _decode_user_from_token(token: str) -> User:
     token_str = token_parts[1]
 
     try:
-        # Get the signing key that matches the token
-        signing_key = jwks.get_signing_key_from_jwt(token_str)
-
-        claims = jwt_decode(
-            token_str,
-            signing_key.key,
-            algorithms=["RS256"],
-            options={"verify_aud": False},
-        )
-
+        claims = await _decode_token_claims(token_str)
         groups = claims.get("cognito:groups", [])
 
         # Extract user information from claims and userinfo
@@ -192,7 +230,7 @@ async def get_user(
         if no token was passed.
     """
     if token is not None:
-        user = _decode_user_from_token(token)
+        user = await _decode_user_from_token(token)
     elif api_key is not None:
         user, _ = _decode_user_info_from_api_key(api_key)
     else:
@@ -233,25 +271,41 @@ def require_permissions(permissions: set[Literal["admin", "upload"]]) -> Callabl
     return dependency
 
 
-async def _decode_user_info_from_token(token: Annotated[str, Depends(oidc)]) -> UserInfo:
+# Shared so that endpoints (and their sub-dependencies) requiring upload
+# permissions reuse the same cached dependency within a request.
+require_upload = require_permissions({"upload"})
+
+
+@cache_async_result(num_seconds=USERINFO_ENDPOINT_CACHE_SECONDS)
+async def _get_userinfo_endpoint() -> str:
     async with AsyncClient() as client:
-        # Gets the metadata from the OpenID Connect server.
         metadata_response = await client.get(SERVER_METADATA_URL)
-        metadata = metadata_response.json()
-        if (userinfo_endpoint := metadata.get("userinfo_endpoint")) is None:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Userinfo endpoint not found in server metadata",
-            )
+    metadata = metadata_response.json()
+    if (userinfo_endpoint := metadata.get("userinfo_endpoint")) is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Userinfo endpoint not found in server metadata",
+        )
+    return userinfo_endpoint
+
+
+async def _decode_user_info_from_token(token: Annotated[str, Depends(oidc)]) -> UserInfo:
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    if (userinfo := user_info_cache.get(cache_key)) is not None:
+        return userinfo
+
+    # Gets the userinfo endpoint from the OpenID Connect server metadata.
+    userinfo_endpoint = await _get_userinfo_endpoint()
 
+    async with AsyncClient() as client:
         # Gets and parses the userinfo response.
         userinfo_response = await client.get(
             userinfo_endpoint,
             headers={"Authorization": token},
         )
-        userinfo = userinfo_response.json()
-        email = userinfo.get("email")
-        email_verified_str = userinfo.get("email_verified")
+        userinfo_json = userinfo_response.json()
+        email = userinfo_json.get("email")
+        email_verified_str = userinfo_json.get("email_verified")
         if not isinstance(email, str) or email_verified_str not in ("true", "false"):
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -262,6 +316,7 @@ async def _decode_user_info_from_token(token: Annotated[str, Depends(oidc)]) ->
         email=email,
         email_verified=email_verified_str == "true",
     )
+    user_info_cache.put(cache_key, userinfo)
 
     return userinfo
 
@@ -271,14 +326,14 @@ async def require_user_info(
     token: Annotated[str | None, Depends(oidc)],
     api_key: Annotated[str | None, Depends(api_key)],
 ) -> UserInfo:
-    if "userinfo" in request.session:
-        return UserInfo(**request.session["userinfo"])
+    if (session_userinfo := request.session.get("userinfo")) is not None:
+        return UserInfo(**session_userinfo)
     if token is not None:
         userinfo = await _decode_user_info_from_token(token)
-        request.session["userinfo"] = userinfo.model_dump()
+        request.session["userinfo"] = asdict(userinfo)
     elif api_key is not None:
         _, userinfo = _decode_user_info_from_api_key(api_key)
-        request.session["userinfo"] = userinfo.model_dump()
+        request.session["userinfo"] = asdict(userinfo)
     else:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not authenticated")
     return userinfo
@@ -1,6 +1,6 @@
 """Defines the common CRUD operations for the application."""
 
-__all__ = ["robot_crud", "robot_class_crud", "s3_crud"]
+__all__ = ["robot_crud", "robot_class_crud", "s3_crud", "unique_name_crud"]
 
 import asyncio
 import logging
@@ -8,6 +8,7 @@ import logging
 from .base.s3 import s3_crud
 from .robot import robot_crud
 from .robot_class import robot_class_crud
+from .unique_name import unique_name_crud
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +31,34 @@ async def create_robot_class_table() -> None:
         await robot_class.create_table()
 
 
+async def create_unique_name_table() -> None:
+    logger.info("Creating unique name table...")
+    async with unique_name_crud as unique_name:
+        await unique_name.create_table()
+
+
 async def create() -> None:
     await asyncio.gather(
         create_s3_bucket(),
         create_robot_table(),
         create_robot_class_table(),
+        create_unique_name_table(),
+    )
+
+
+async def startup() -> None:
+    """Opens the AWS resources shared by all requests."""
+    await asyncio.gather(
+        s3_crud.startup(),
+        robot_crud.startup(),
+        robot_class_crud.startup(),
+    )
+
+
+async def shutdown() -> None:
+    """Closes the AWS resources opened by `startup`."""
+    await asyncio.gather(
+        s3_crud.shutdown(),
+        robot_crud.shutdown(),
+        robot_class_crud.shutdown(),
     )
@@ -0,0 +1,88 @@
+"""Defines the AWS session and client configuration shared by the CRUDs."""
+
+import asyncio
+import functools
+from typing import AsyncContextManager, Callable, Generic, TypeVar
+
+import aioboto3
+from aiobotocore.config import AioConfig
+from types_aiobotocore_dynamodb.service_resource import DynamoDBServiceResource
+
+from www.settings import env
+
+# Shared by all CRUD instances, so that the botocore loaders and config files
+# are only read once per process.
+SESSION = aioboto3.Session()
+
+T = TypeVar("T")
+
+
+@functools.cache
+def get_client_config() -> AioConfig:
+    """Returns the botocore configuration used for all AWS clients.
+
+    The default connection pool only holds 10 connections, which serializes
+    concurrent requests beyond that, so the pool size is configurable. TCP
+    keep-alive avoids paying for a new TLS handshake after idle periods.
+
+    Returns:
+        The shared client configuration.
+    """
+    return AioConfig(
+        max_pool_connections=env.aws.max_pool_connections,
+        tcp_keepalive=True,
+        retries={"mode": "adaptive", "max_attempts": env.aws.max_retry_attempts},
+        connect_timeout=env.aws.connect_timeout,
+        read_timeout=env.aws.read_timeout,
+    )
+
+
+class SharedResource(Generic[T]):
+    """An AWS service resource which is shared by several CRUDs.
+
+    Each resource holds its own connection pool, so rather than having every
+    CRUD open a separate one, the first `acquire` opens the resource and the
+    last matching `release` closes it.
+
+    Args:
+        factory: Creates the context manager which opens the resource.
+    """
+
+    def __init__(self, factory: Callable[[], AsyncContextManager[T]]) -> None:
+        super().__init__()
+
+        self.factory = factory
+        self._count = 0
+        self._context: AsyncContextManager[T] | None = None
+        self._opening: asyncio.Task[T] | None = None
+
+    async def _open(self) -> T:
+        self._context = self.factory()
+        return await self._context.__aenter__()
+
+    async def acquire(self) -> T:
+        """Returns the shared resource, opening it if needed."""
+        self._count += 1
+        if self._opening is None:
+            self._opening = asyncio.create_task(self._open())
+        try:
+            return await asyncio.shield(self._opening)
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self) -> None:
+        """Releases the resource, closing it once nothing else holds it."""
+        self._count -= 1
+        if self._count > 0 or self._opening is None:
+            return
+        opening, self._opening = self._opening, None
+        if not opening.done():
+            opening.cancel()
+        elif not opening.cancelled() and opening.exception() is None and self._context is not None:
+            await self._context.__aexit__(None, None, None)
+
+
+DYNAMODB = SharedResource[DynamoDBServiceResource](
+    lambda: SESSION.resource("dynamodb", config=get_client_config()),
+)
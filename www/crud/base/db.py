@@ -4,21 +4,26 @@ import asyncio
 import functools
 import itertools
 import logging
+import random
 from abc import ABC, abstractmethod
 from typing import (
     Any,
     AsyncContextManager,
-    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
     Literal,
+    Mapping,
     Self,
     TypeVar,
 )
 
-import aioboto3
 from botocore.exceptions import ClientError
 from pydantic import BaseModel
 from types_aiobotocore_dynamodb.service_resource import DynamoDBServiceResource, Table
+from types_aiobotocore_dynamodb.type_defs import TransactWriteItemTypeDef
 
+from www.crud.base.client import DYNAMODB
 from www.settings import env
 
 logger = logging.getLogger(__name__)
@@ -27,17 +32,27 @@ T = TypeVar("T", bound=BaseModel)
 
 DEFAULT_CHUNK_SIZE = 100
 DEFAULT_SCAN_LIMIT = 1000
+MAX_BATCH_GET_RETRIES = 5
+MAX_CREATE_TABLE_ATTEMPTS = 8
 ITEMS_PER_PAGE = 12
 
 TableKey = tuple[str, Literal["S", "N", "B"], Literal["HASH", "RANGE"]]
 GlobalSecondaryIndex = tuple[str, str, Literal["S", "N", "B"], Literal["HASH", "RANGE"]]
 
+# The table holding the sentinel items which enforce unique names.
+UNIQUE_NAME_TABLE = "unique-name"
+
 
 class DBCrud(AsyncContextManager["DBCrud"], ABC):
     def __init__(self) -> None:
         super().__init__()
 
         self.__db: DynamoDBServiceResource | None = None
+        self.__table: Table | None = None
+        self.__users = 0
+        self.__lock = asyncio.Lock()
+        self._conditional_check_failed: type[ClientError] = ClientError
+        self._transaction_canceled: type[ClientError] = ClientError
 
     @abstractmethod
     def _get_table_name(self) -> str:
@@ -46,16 +61,22 @@ class DBCrud(AsyncContextManager["DBCrud"], ABC):
     @property
     def db(self) -> DynamoDBServiceResource:
         if self.__db is None:
-            raise RuntimeError("Must call __aenter__ first!")
+            raise RuntimeError("Must call startup first!")
         return self.__db
 
     @functools.cached_property
     def table_name(self) -> str:
         return f"{env.aws.dynamodb.table_prefix}-{self._get_table_name()}"
 
+    @functools.cached_property
+    def unique_name_table_name(self) -> str:
+        return f"{env.aws.dynamodb.table_prefix}-{UNIQUE_NAME_TABLE}"
+
     @property
-    async def table(self) -> Table:
-        return await self.db.Table(self.table_name)
+    def table(self) -> Table:
+        if self.__table is None:
+            raise RuntimeError("Must call startup first!")
+        return self.__table
 
     @classmethod
     def get_keys(cls) -> list[TableKey]:
@@ -69,79 +90,373 @@ class DBCrud(AsyncContextManager["DBCrud"], ABC):
     def get_gsi_index_name(cls, colname: str) -> str:
         return f"{colname}_index"
 
+    async def startup(self) -> None:
+        """Acquires the DynamoDB resource, which is shared by all CRUDs.
+
+        The CRUDs are shared singletons, so every call must be matched by a
+        call to `shutdown`, and the resource is only released by the last one.
+        """
+        async with self.__lock:
+            self.__users += 1
+            if self.__db is not None:
+                return
+            try:
+                db = await DYNAMODB.acquire()
+                try:
+                    self.__table = await db.Table(self.table_name)
+                except BaseException:
+                    await DYNAMODB.release()
+                    raise
+            except BaseException:
+                self.__users -= 1
+                raise
+            self.__db = db
+
+            # Looked up once, rather than on every `except` clause which checks them.
+            exceptions = db.meta.client.exceptions
+            self._conditional_check_failed = exceptions.ConditionalCheckFailedException
+            self._transaction_canceled = exceptions.TransactionCanceledException
+
+    async def shutdown(self) -> None:
+        """Releases the DynamoDB resource once every `startup` has shut down."""
+        async with self.__lock:
+            if self.__users == 0:
+                return
+            self.__users -= 1
+            if self.__users > 0 or self.__db is None:
+                return
+            self.__db, self.__table = None, None
+            await DYNAMODB.release()
+
     async def __aenter__(self) -> Self:
         await super().__aenter__()
-        session = aioboto3.Session()
-        db = session.resource("dynamodb")
-        self.__db = await db.__aenter__()
+        await self.startup()
         return self
 
     async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:  # noqa: ANN401
-        to_close = []
-        if self.__db is not None:
-            to_close.append(self.__db)
+        await self.shutdown()
+        await super().__aexit__(exc_type, exc_val, exc_tb)
+
+    async def __call__(self) -> Self:
+        return self
+
+    async def _get_by_known_id(self, record_id: str, consistent_read: bool = False) -> dict[str, Any] | None:
+        table = self.table
+        response = await table.get_item(Key={"id": record_id}, ConsistentRead=consistent_read)
+        return response.get("Item")
+
+    async def get_many_by_ids(self, ids: list[str], concurrency: int = 8) -> dict[str, dict[str, Any]]:
+        """Gets several items by ID, using as few requests as possible.
+
+        The IDs are fetched in chunks of 100, which is the most that a single
+        BatchGetItem request accepts. Keys which DynamoDB leaves unprocessed
+        because of throttling are retried with exponential backoff.
+
+        Args:
+            ids: The IDs of the items to get.
+            concurrency: The maximum number of chunks to fetch at once.
+
+        Returns:
+            The items that were found, keyed by their ID.
+        """
+        db = self.db
+        table_name = self.table_name
+        semaphore = asyncio.Semaphore(concurrency)
+        items: dict[str, dict[str, Any]] = {}
+
+        async def get_chunk(chunk: list[str]) -> None:
+            keys: list[dict[str, Any]] = [{"id": record_id} for record_id in chunk]
+            async with semaphore:
+                for attempt in range(MAX_BATCH_GET_RETRIES + 1):
+                    if attempt > 0:
+                        await asyncio.sleep(0.05 * 2**attempt)
+                    response = await db.batch_get_item(RequestItems={table_name: {"Keys": keys}})
+                    for item in response.get("Responses", {}).get(table_name, []):
+                        items[str(item["id"])] = item
+                    if not (unprocessed := response.get("UnprocessedKeys", {})).get(table_name):
+                        return
+                    keys = list(unprocessed[table_name]["Keys"])
+            raise RuntimeError(f"Failed to get {len(keys)} items from {table_name}")
+
+        unique_ids = list(dict.fromkeys(ids))
         await asyncio.gather(
-            super().__aexit__(exc_type, exc_val, exc_tb),
-            *(resource.__aexit__(exc_type, exc_val, exc_tb) for resource in to_close),
+            *(get_chunk(unique_ids[i : i + DEFAULT_CHUNK_SIZE]) for i in range(0, len(unique_ids), DEFAULT_CHUNK_SIZE)),
         )
+        return items
 
-    async def __call__(self) -> AsyncGenerator[Self, None]:
-        async with self as crud:
-            yield crud
+    async def _paginate(
+        self,
+        fetch: Callable[..., Awaitable[Any]],
+        **kwargs: Any,  # noqa: ANN401
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yields the items of a query or scan one page at a time.
 
-    async def _get_by_known_id(self, record_id: str) -> dict[str, Any] | None:
-        table = await self.table
-        response = await table.get_item(Key={"id": record_id})
-        return response.get("Item")
+        DynamoDB returns at most 1 MB per request, so this follows the
+        `LastEvaluatedKey` until all of the matching items have been read.
+
+        Args:
+            fetch: The table method to call, such as `table.query`.
+            kwargs: The arguments to pass to `fetch`.
+
+        Yields:
+            The items in each page of the response.
+        """
+        while True:
+            response = await fetch(**kwargs)
+            yield response.get("Items", [])
+            if (last_key := response.get("LastEvaluatedKey")) is None:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+
+    def _get_unique_name_key(self, item: Mapping[str, Any]) -> str | None:
+        """Returns the name which must be unique for an item in this table.
+
+        DynamoDB can only enforce uniqueness on a primary key, so tables
+        with unique names claim each name by writing a sentinel item to the
+        unique name table, in the same transaction as the item itself.
+
+        Args:
+            item: The item to get the unique name for.
+
+        Returns:
+            The key of the unique name, or None if names in this table are
+            not required to be unique.
+        """
+        return None
+
+    # The items below are sent through the resource's client, which takes
+    # plain Python values rather than DynamoDB attribute-value dicts.
+    def _unique_name_put(self, item: Mapping[str, Any]) -> TransactWriteItemTypeDef:
+        if (name_key := self._get_unique_name_key(item)) is None:
+            raise ValueError(f"Table {self.table_name} does not have unique names")
+        return {
+            "Put": {
+                "TableName": self.unique_name_table_name,
+                "Item": {"id": name_key, "item_id": item["id"]},
+                # The item may already own the name, such as when backfilling.
+                "ConditionExpression": "attribute_not_exists(id) OR item_id = :item_id",
+                "ExpressionAttributeValues": {":item_id": item["id"]},
+            },
+        }
+
+    def _unique_name_delete(self, item: Mapping[str, Any]) -> TransactWriteItemTypeDef:
+        if (name_key := self._get_unique_name_key(item)) is None:
+            raise ValueError(f"Table {self.table_name} does not have unique names")
+        return {
+            "Delete": {
+                "TableName": self.unique_name_table_name,
+                "Key": {"id": name_key},
+                # Only releases the name if this item still owns it.
+                "ConditionExpression": "item_id = :item_id",
+                "ExpressionAttributeValues": {":item_id": item["id"]},
+            },
+        }
+
+    async def _owns_unique_name(self, item: Mapping[str, Any]) -> bool:
+        # Items written before unique names were enforced may share a name
+        # with an item which claimed it, in which case the claim is left alone.
+        if (name_key := self._get_unique_name_key(item)) is None:
+            raise ValueError(f"Table {self.table_name} does not have unique names")
+        response = await self.db.meta.client.get_item(
+            TableName=self.unique_name_table_name,
+            Key={"id": name_key},
+            ConsistentRead=True,
+        )
+        return (owner := response.get("Item")) is not None and owner["item_id"] == item["id"]
+
+    async def _put_item_with_unique_name(self, item: Mapping[str, Any]) -> bool:
+        """Adds an item to the table, claiming its unique name.
+
+        Args:
+            item: The item to add.
+
+        Returns:
+            True if the item was added, or False if its name is already taken.
+        """
+        client = self.db.meta.client
+        try:
+            await client.transact_write_items(
+                TransactItems=[
+                    self._unique_name_put(item),
+                    {
+                        "Put": {
+                            "TableName": self.table_name,
+                            "Item": dict(item),
+                            "ConditionExpression": "attribute_not_exists(id)",
+                        },
+                    },
+                ],
+            )
+        except self._transaction_canceled:
+            return False
+        return True
+
+    async def _update_item_with_unique_name(
+        self,
+        old_item: Mapping[str, Any],
+        new_item: Mapping[str, Any],
+        update_expression: str,
+        condition_expression: str,
+        expression_attribute_values: Mapping[str, Any],
+    ) -> bool:
+        """Updates an item in the table, moving its unique name if it changed.
+
+        Claiming the new name, releasing the old name and updating the item
+        all happen in a single transaction, so concurrent renames can't both
+        succeed.
+
+        Args:
+            old_item: The item before the update.
+            new_item: The item after the update.
+            update_expression: The update expression for the item.
+            condition_expression: The condition the item must satisfy.
+            expression_attribute_values: The values for both expressions.
+
+        Returns:
+            True if the item was updated, or False if the new name is already
+            taken or the condition failed.
+        """
+        client = self.db.meta.client
+        transact_items: list[TransactWriteItemTypeDef] = []
+        if self._get_unique_name_key(old_item) != self._get_unique_name_key(new_item):
+            transact_items.append(self._unique_name_put(new_item))
+            if await self._owns_unique_name(old_item):
+                transact_items.append(self._unique_name_delete(old_item))
+        transact_items.append(
+            {
+                "Update": {
+                    "TableName": self.table_name,
+                    "Key": {"id": old_item["id"]},
+                    "UpdateExpression": update_expression,
+                    "ConditionExpression": condition_expression,
+                    "ExpressionAttributeValues": dict(expression_attribute_values),
+                },
+            },
+        )
+        try:
+            await client.transact_write_items(TransactItems=transact_items)
+        except self._transaction_canceled:
+            return False
+        return True
+
+    async def _claim_unique_name(self, item: Mapping[str, Any]) -> bool:
+        """Claims the unique name for an existing item.
+
+        Args:
+            item: The item to claim the name for.
+
+        Returns:
+            True if the name was claimed, or False if it is already taken.
+        """
+        client = self.db.meta.client
+        try:
+            await client.put_item(**self._unique_name_put(item)["Put"])
+        except self._conditional_check_failed:
+            return False
+        return True
+
+    async def _delete_item_with_unique_name(self, item: Mapping[str, Any]) -> None:
+        """Deletes an item from the table, releasing its unique name.
+
+        Args:
+            item: The item to delete.
+        """
+        transact_items: list[TransactWriteItemTypeDef] = []
+        if await self._owns_unique_name(item):
+            transact_items.append(self._unique_name_delete(item))
+        transact_items.append(
+            {
+                "Delete": {
+                    "TableName": self.table_name,
+                    "Key": {"id": item["id"]},
+                },
+            },
+        )
+        await self.db.meta.client.transact_write_items(TransactItems=transact_items)
+
+    async def backfill_unique_names(self) -> None:
+        """Claims the unique names of any items which do not have one yet."""
+        async for items in self._paginate(self.table.scan, Limit=DEFAULT_SCAN_LIMIT):
+            for item in items:
+                if self._get_unique_name_key(item) is None:
+                    return
+                if not await self._claim_unique_name(item):
+                    logger.warning("Name of item %s in %s is already claimed", item["id"], self.table_name)
 
     async def create_table(self) -> None:
+        """Creates the table if it doesn't already exist.
+
+        Creating tables is retried with jittered exponential backoff when
+        DynamoDB is throttling control plane requests, and a table which is
+        created concurrently by another process is waited on rather than
+        treated as an error.
+        """
+        client = self.db.meta.client
         try:
-            await self.db.meta.client.describe_table(TableName=self.table_name)
+            response = await client.describe_table(TableName=self.table_name)
             logger.info("Found existing table %s", self.table_name)
+
+            # The table may still be being created by another process.
+            if response["Table"].get("TableStatus") == "CREATING":
+                await (await self.db.Table(self.table_name)).wait_until_exists()
             return
 
-        except ClientError:
+        except client.exceptions.ResourceNotFoundException:
             pass
 
-        logger.info("Creating table %s", self.table_name)
-        gsis_set = self.get_gsis()
-        gsis: list[tuple[str, str, Literal["S", "N", "B"], Literal["HASH", "RANGE"]]] = [
-            (f"{g}_index", g, "S", "HASH") for g in gsis_set
-        ]
-        keys = self.get_keys()
-
-        if gsis:
-            table = await self.db.create_table(
-                TableName=self.table_name,
-                AttributeDefinitions=[
-                    {"AttributeName": n, "AttributeType": t}
-                    for n, t in itertools.chain(((n, t) for (n, t, _) in keys), ((n, t) for _, n, t, _ in gsis))
-                ],
-                KeySchema=[{"AttributeName": n, "KeyType": t} for n, _, t in keys],
-                GlobalSecondaryIndexes=(
-                    [
-                        {
-                            "IndexName": i,
-                            "KeySchema": [{"AttributeName": n, "KeyType": t}],
-                            "Projection": {"ProjectionType": "ALL"},
-                        }
-                        for i, n, _, t in gsis
-                    ]
-                ),
-                DeletionProtectionEnabled=env.aws.dynamodb.deletion_protection,
-                BillingMode="PAY_PER_REQUEST",
-            )
+        async def create() -> Table:
+            gsis_set = self.get_gsis()
+            gsis: list[tuple[str, str, Literal["S", "N", "B"], Literal["HASH", "RANGE"]]] = [
+                (f"{g}_index", g, "S", "HASH") for g in gsis_set
+            ]
+            keys = self.get_keys()
 
-        else:
-            table = await self.db.create_table(
-                AttributeDefinitions=[
-                    {"AttributeName": n, "AttributeType": t} for n, t in ((n, t) for (n, t, _) in keys)
-                ],
-                TableName=self.table_name,
-                KeySchema=[{"AttributeName": n, "KeyType": t} for n, _, t in keys],
-                DeletionProtectionEnabled=env.aws.dynamodb.deletion_protection,
-                BillingMode="PAY_PER_REQUEST",
-            )
+            if gsis:
+                return await self.db.create_table(
+                    TableName=self.table_name,
+                    AttributeDefinitions=[
+                        {"AttributeName": n, "AttributeType": t}
+                        for n, t in itertools.chain(((n, t) for (n, t, _) in keys), ((n, t) for _, n, t, _ in gsis))
+                    ],
+                    KeySchema=[{"AttributeName": n, "KeyType": t} for n, _, t in keys],
+                    GlobalSecondaryIndexes=(
+                        [
+                            {
+                                "IndexName": i,
+                                "KeySchema": [{"AttributeName": n, "KeyType": t}],
+                                "Projection": {"ProjectionType": "ALL"},
+                            }
+                            for i, n, _, t in gsis
+                        ]
+                    ),
+                    DeletionProtectionEnabled=env.aws.dynamodb.deletion_protection,
+                    BillingMode="PAY_PER_REQUEST",
+                )
+
+            else:
+                return await self.db.create_table(
+                    AttributeDefinitions=[
+                        {"AttributeName": n, "AttributeType": t} for n, t in ((n, t) for (n, t, _) in keys)
+                    ],
+                    TableName=self.table_name,
+                    KeySchema=[{"AttributeName": n, "KeyType": t} for n, _, t in keys],
+                    DeletionProtectionEnabled=env.aws.dynamodb.deletion_protection,
+                    BillingMode="PAY_PER_REQUEST",
+                )
+
+        logger.info("Creating table %s", self.table_name)
+        for attempt in range(MAX_CREATE_TABLE_ATTEMPTS):
+            try:
+                table = await create()
+                break
+            except client.exceptions.ResourceInUseException:
+                logger.info("Table %s is already being created", self.table_name)
+                table = await self.db.Table(self.table_name)
+                break
+            except client.exceptions.LimitExceededException:
+                if attempt == MAX_CREATE_TABLE_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(2**attempt, 30)))
 
         # Wait for the table to be created.
         await table.wait_until_exists()
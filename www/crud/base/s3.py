@@ -1,69 +1,175 @@
 """Defines a base CRUD interface for interacting with S3 buckets."""
 
 import asyncio
+import collections
+import itertools
 import logging
 from typing import (
     IO,
     Any,
     AsyncContextManager,
-    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
     Self,
+    cast,
 )
 
-import aioboto3
+import boto3
+from aiobotocore.credentials import AioCredentials
 from aiobotocore.response import StreamingBody
+from boto3.s3.transfer import TransferConfig
+from botocore.credentials import ReadOnlyCredentials
 from botocore.exceptions import ClientError
-from types_aiobotocore_s3.service_resource import S3ServiceResource
+from types_aiobotocore_s3.client import S3Client
+from types_aiobotocore_s3.service_resource import Bucket, S3ServiceResource
+from types_aiobotocore_s3.type_defs import CompletedPartTypeDef, ObjectIdentifierTypeDef
 
+from www.crud.base.client import SESSION, get_client_config
 from www.settings import env
 
 logger = logging.getLogger(__name__)
 
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_CHUNK_SIZE,
+    multipart_chunksize=MULTIPART_CHUNK_SIZE,
+    max_concurrency=16,
+    use_threads=False,
+)
+
+MAX_DELETE_KEYS = 1000
+
+# Replaces non-breaking spaces, which break the Content-Disposition header.
+NAME_WHITESPACE_TABLE = str.maketrans({"\u202f": " ", "\xa0": " "})
+
 
 class S3Crud(AsyncContextManager["S3Crud"]):
     def __init__(self) -> None:
         super().__init__()
         self.__s3: S3ServiceResource | None = None
+        self.__bucket: Bucket | None = None
+        self.__presign_client: Any = None
+        self.__presign_credentials: ReadOnlyCredentials | None = None
+        self.__presign_lock = asyncio.Lock()
+        self.__key_prefix = ""
+        self.__bucket_name = ""
+        self.__users = 0
+        self.__lock = asyncio.Lock()
 
     @property
     def s3(self) -> S3ServiceResource:
         if self.__s3 is None:
-            raise RuntimeError("Must call __aenter__ first!")
+            raise RuntimeError("Must call startup first!")
         return self.__s3
 
+    @property
+    def client(self) -> S3Client:
+        return self.s3.meta.client
+
+    @property
+    def bucket(self) -> Bucket:
+        if self.__bucket is None:
+            raise RuntimeError("Must call startup first!")
+        return self.__bucket
+
+    async def _get_presign_client(self) -> Any:  # noqa: ANN401
+        """Returns a synchronous client for presigning URLs.
+
+        Presigning is a local HMAC computation once the credentials are
+        known, so it is done with a synchronous client to skip the event
+        loop. The credentials come from the shared session, and are refreshed
+        asynchronously; the client is rebuilt in a worker thread whenever
+        they change, so nothing blocks the event loop.
+        """
+        credentials = await cast(Awaitable[AioCredentials | None], SESSION.get_credentials())
+        if credentials is None:
+            raise RuntimeError("No AWS credentials found")
+        frozen = await credentials.get_frozen_credentials()
+        async with self.__presign_lock:
+            if self.__presign_client is None or frozen != self.__presign_credentials:
+                self.__presign_client = await asyncio.to_thread(self._new_presign_client, frozen)
+                self.__presign_credentials = frozen
+            return self.__presign_client
+
+    def _new_presign_client(self, credentials: ReadOnlyCredentials) -> Any:  # noqa: ANN401
+        meta = self.client.meta
+        return boto3.session.Session().client(
+            "s3",
+            region_name=meta.region_name,
+            endpoint_url=meta.endpoint_url,
+            aws_access_key_id=credentials.access_key,
+            aws_secret_access_key=credentials.secret_key,
+            aws_session_token=credentials.token,
+            config=get_client_config(),
+        )
+
     @property
     def prefix(self) -> str:
         return ""
 
+    def _key(self, filename: str) -> str:
+        return self.__key_prefix + filename
+
+    async def startup(self) -> None:
+        """Opens the S3 resource, which is then shared by all requests.
+
+        The CRUD is a shared singleton, so every call must be matched by a
+        call to `shutdown`, and the resource is only closed by the last one.
+        """
+        async with self.__lock:
+            self.__users += 1
+            if self.__s3 is not None:
+                return
+            try:
+                self.__key_prefix = env.aws.s3.prefix
+                self.__bucket_name = env.aws.s3.bucket
+                context = SESSION.resource("s3", config=get_client_config())
+                s3 = await context.__aenter__()
+                try:
+                    self.__bucket = await s3.Bucket(self.__bucket_name)
+                except BaseException:
+                    await s3.__aexit__(None, None, None)
+                    raise
+            except BaseException:
+                self.__users -= 1
+                raise
+            self.__s3 = s3
+
+    async def shutdown(self) -> None:
+        """Closes the S3 resource once every `startup` has shut down."""
+        async with self.__lock:
+            if self.__users == 0:
+                return
+            self.__users -= 1
+            if self.__users > 0 or self.__s3 is None:
+                return
+            s3, self.__s3, self.__bucket, self.__presign_client = self.__s3, None, None, None
+            self.__presign_credentials = None
+            await s3.__aexit__(None, None, None)
+
     async def __aenter__(self) -> Self:
         await super().__aenter__()
-        session = aioboto3.Session()
-        s3 = session.resource("s3")
-        self.__s3 = await s3.__aenter__()
+        await self.startup()
         return self
 
     async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:  # noqa: ANN401
-        to_close = []
-        if self.__s3 is not None:
-            to_close.append(self.__s3)
-        await asyncio.gather(
-            super().__aexit__(exc_type, exc_val, exc_tb),
-            *(resource.__aexit__(exc_type, exc_val, exc_tb) for resource in to_close),
-        )
+        await self.shutdown()
+        await super().__aexit__(exc_type, exc_val, exc_tb)
 
     async def create_bucket(self) -> None:
         try:
-            await self.s3.meta.client.head_bucket(Bucket=env.aws.s3.bucket)
-            logger.info("Found existing bucket %s", env.aws.s3.bucket)
+            await self.client.head_bucket(Bucket=self.__bucket_name)
+            logger.info("Found existing bucket %s", self.__bucket_name)
             return
         except ClientError:
             pass
 
-        logger.info("Creating bucket %s", env.aws.s3.bucket)
-        await self.s3.create_bucket(Bucket=env.aws.s3.bucket)
+        logger.info("Creating bucket %s", self.__bucket_name)
+        await self.s3.create_bucket(Bucket=self.__bucket_name)
 
-        logger.info("Updating %s CORS configuration", env.aws.s3.bucket)
-        s3_cors = await self.s3.BucketCors(env.aws.s3.bucket)
+        logger.info("Updating %s CORS configuration", self.__bucket_name)
+        s3_cors = await self.s3.BucketCors(self.__bucket_name)
         await s3_cors.put(
             CORSConfiguration={
                 "CORSRules": [
@@ -87,9 +193,9 @@ class S3Crud(AsyncContextManager["S3Crud"]):
             The size in bytes, or None if the file doesn't exist
         """
         try:
-            s3_object = await self.s3.meta.client.head_object(
-                Bucket=env.aws.s3.bucket,
-                Key=f"{env.aws.s3.prefix}{filename}",
+            s3_object = await self.client.head_object(
+                Bucket=self.__bucket_name,
+                Key=self._key(filename),
             )
             return s3_object.get("ContentLength")
         except ClientError as e:
@@ -100,23 +206,124 @@ class S3Crud(AsyncContextManager["S3Crud"]):
             return None
 
     async def upload_to_s3(self, data: IO[bytes], name: str, filename: str, content_type: str) -> None:
-        """Uploads some data to S3."""
-        try:
-            bucket = await self.s3.Bucket(env.aws.s3.bucket)
+        """Uploads some data to S3.
 
-            sanitized_name = name.replace("\u202f", " ").replace("\xa0", " ")
+        Files larger than the multipart threshold are uploaded as concurrent
+        multipart uploads; smaller files use a single PUT request.
+
+        Args:
+            data: The file-like object to upload.
+            name: The original name of the file, for the Content-Disposition.
+            filename: The filename of the object in S3.
+            content_type: The content type of the file.
+        """
+        try:
+            sanitized_name = name.translate(NAME_WHITESPACE_TABLE)
 
-            await bucket.put_object(
-                Key=f"{env.aws.s3.prefix}{filename}",
-                Body=data,
-                ContentType=content_type,
-                ContentDisposition=f'attachment; filename="{sanitized_name}"',
+            await self.client.upload_fileobj(
+                Fileobj=data,
+                Bucket=self.__bucket_name,
+                Key=self._key(filename),
+                ExtraArgs={
+                    "ContentType": content_type,
+                    "ContentDisposition": f'attachment; filename="{sanitized_name}"',
+                },
+                Config=TRANSFER_CONFIG,
             )
             logger.info("S3 upload successful")
         except ClientError as e:
             logger.exception("S3 upload failed: %s", e)
             raise
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        name: str,
+        filename: str,
+        content_type: str,
+        *,
+        part_size: int = MULTIPART_CHUNK_SIZE,
+        concurrency: int = 4,
+    ) -> None:
+        """Uploads a stream of data to S3 without buffering all of it.
+
+        The chunks are regrouped into parts of `part_size` bytes, which are
+        uploaded by `concurrency` workers, so at most a few parts are held in
+        memory at once. If anything fails, the multipart upload is aborted.
+
+        Args:
+            chunks: The data to upload.
+            name: The original name of the file, for the Content-Disposition.
+            filename: The filename of the object in S3.
+            content_type: The content type of the file.
+            part_size: The size of each uploaded part, which S3 requires to
+                be at least 5 MiB for all but the last part.
+            concurrency: The maximum number of parts to upload at once.
+        """
+        client = self.client
+        key = self._key(filename)
+        sanitized_name = name.translate(NAME_WHITESPACE_TABLE)
+
+        upload = await client.create_multipart_upload(
+            Bucket=self.__bucket_name,
+            Key=key,
+            ContentType=content_type,
+            ContentDisposition=f'attachment; filename="{sanitized_name}"',
+        )
+        upload_id = upload["UploadId"]
+
+        queue: asyncio.Queue[tuple[int, bytes] | None] = asyncio.Queue(maxsize=concurrency)
+        parts: list[CompletedPartTypeDef] = []
+
+        async def worker() -> None:
+            while (item := await queue.get()) is not None:
+                part_number, body = item
+                response = await client.upload_part(
+                    Bucket=self.__bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+        async def producer() -> None:
+            buffer, part_number = bytearray(), 1
+            async for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    await queue.put((part_number, bytes(buffer[:part_size])))
+                    del buffer[:part_size]
+                    part_number += 1
+            if buffer or part_number == 1:
+                await queue.put((part_number, bytes(buffer)))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(producer())
+                for _ in range(concurrency):
+                    tg.create_task(worker())
+
+            parts.sort(key=lambda part: part["PartNumber"])
+            await client.complete_multipart_upload(
+                Bucket=self.__bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            logger.info("S3 streaming upload successful")
+        except BaseException as e:
+            logger.exception("S3 streaming upload failed")
+            await client.abort_multipart_upload(Bucket=self.__bucket_name, Key=key, UploadId=upload_id)
+
+            # Errors from the task group are wrapped in an exception group, so
+            # the first underlying error is raised instead.
+            if isinstance(e, BaseExceptionGroup):
+                raise e.exceptions[0]
+            raise
+
     async def download_from_s3(self, filename: str) -> StreamingBody:
         """Downloads an object from S3.
 
@@ -126,25 +333,102 @@ class S3Crud(AsyncContextManager["S3Crud"]):
         Returns:
             The object data.
         """
-        bucket = await self.s3.Bucket(env.aws.s3.bucket)
-        obj = await bucket.Object(f"{env.aws.s3.prefix}{filename}")
+        obj = await self.bucket.Object(self._key(filename))
         data = await obj.get()
         return data["Body"]
 
+    async def download_ranged(
+        self,
+        filename: str,
+        part_size: int = MULTIPART_CHUNK_SIZE,
+        concurrency: int = 16,
+    ) -> AsyncIterator[bytes]:
+        """Streams an object from S3 using concurrent ranged GET requests.
+
+        A single GET is limited by the throughput of one connection, so large
+        objects are fetched as several byte ranges in parallel. At most
+        `concurrency` parts are in flight or buffered at once, and the parts
+        are yielded in order.
+
+        Args:
+            filename: The filename of the object to download.
+            part_size: The number of bytes to fetch per request.
+            concurrency: The maximum number of parts to fetch at once.
+
+        Yields:
+            The object data, one part at a time.
+        """
+        client = self.client
+        key = self._key(filename)
+        head = await client.head_object(Bucket=self.__bucket_name, Key=key)
+        size, etag = head["ContentLength"], head["ETag"]
+
+        async def get_part(start: int) -> bytes:
+            end = min(start + part_size, size) - 1
+            response = await client.get_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+                Range=f"bytes={start}-{end}",
+                IfMatch=etag,
+            )
+            async with response["Body"] as body:
+                return await body.read()
+
+        starts = iter(range(0, size, part_size))
+        pending = collections.deque(
+            asyncio.create_task(get_part(start)) for start in itertools.islice(starts, concurrency)
+        )
+        try:
+            while pending:
+                data = await pending.popleft()
+                if (start := next(starts, None)) is not None:
+                    pending.append(asyncio.create_task(get_part(start)))
+                yield data
+        finally:
+            for task in pending:
+                task.cancel()
+
     async def delete_from_s3(self, filename: str) -> None:
         """Deletes an object from S3.
 
         Args:
             filename: The filename of the object to delete.
         """
-        bucket = await self.s3.Bucket(env.aws.s3.bucket)
-        await bucket.delete_objects(Delete={"Objects": [{"Key": f"{env.aws.s3.prefix}{filename}"}]})
+        await self.delete_many_from_s3([filename])
+
+    async def delete_many_from_s3(self, filenames: list[str], concurrency: int = 4) -> None:
+        """Deletes several objects from S3.
+
+        The keys are deleted in batches of up to 1000, which is the most that
+        a single DeleteObjects request accepts. Keys which don't exist are not
+        an error, but keys which S3 fails to delete raise a `RuntimeError`.
+
+        Args:
+            filenames: The filenames of the objects to delete.
+            concurrency: The maximum number of batches to delete at once.
+        """
+        bucket = self.bucket
+        keys: list[ObjectIdentifierTypeDef] = [{"Key": self._key(filename)} for filename in filenames]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def delete_batch(batch: list[ObjectIdentifierTypeDef]) -> None:
+            async with semaphore:
+                response = await bucket.delete_objects(Delete={"Objects": batch, "Quiet": True})
+
+            # In quiet mode, the response only lists the keys which failed.
+            if errors := response.get("Errors"):
+                for error in errors:
+                    logger.error("Failed to delete %s from S3: %s", error.get("Key"), error.get("Message"))
+                raise RuntimeError(f"Failed to delete {len(errors)} objects from S3")
+
+        await asyncio.gather(
+            *(delete_batch(keys[i : i + MAX_DELETE_KEYS]) for i in range(0, len(keys), MAX_DELETE_KEYS)),
+        )
 
     async def get_file_hash(self, filename: str) -> str:
         """Gets the hash of a file in S3."""
-        bucket = await self.s3.Bucket(env.aws.s3.bucket)
-        obj = await bucket.Object(f"{env.aws.s3.prefix}{filename}")
-        data = await obj.get()
+        # A HEAD request returns the ETag without opening the object body.
+        data = await self.client.head_object(Bucket=self.__bucket_name, Key=self._key(filename))
         return data["ETag"]
 
     async def generate_presigned_download_url(
@@ -153,11 +437,12 @@ class S3Crud(AsyncContextManager["S3Crud"]):
         expires_in: int = 3600,
     ) -> str:
         """Generates a presigned URL for downloading a file from S3."""
-        return await self.s3.meta.client.generate_presigned_url(
+        presign_client = await self._get_presign_client()
+        return presign_client.generate_presigned_url(
             ClientMethod="get_object",
             Params={
-                "Bucket": env.aws.s3.bucket,
-                "Key": f"{env.aws.s3.prefix}{s3_key}",
+                "Bucket": self.__bucket_name,
+                "Key": self._key(s3_key),
             },
             ExpiresIn=expires_in,
         )
@@ -182,12 +467,13 @@ class S3Crud(AsyncContextManager["S3Crud"]):
         Returns:
             Presigned URL for uploading
         """
+        presign_client = await self._get_presign_client()
         try:
-            return await self.s3.meta.client.generate_presigned_url(
+            return presign_client.generate_presigned_url(
                 ClientMethod="put_object",
                 Params={
-                    "Bucket": env.aws.s3.bucket,
-                    "Key": f"{env.aws.s3.prefix}{s3_key}",
+                    "Bucket": self.__bucket_name,
+                    "Key": self._key(s3_key),
                     "ContentType": content_type,
                     "ContentDisposition": f'attachment; filename="{filename}"',
                     "ChecksumAlgorithm": checksum_algorithm,
@@ -198,9 +484,8 @@ class S3Crud(AsyncContextManager["S3Crud"]):
             logger.error("Failed to generate presigned URL: %s", e)
             raise
 
-    async def __call__(self) -> AsyncGenerator[Self, None]:
-        async with self as crud:
-            yield crud
+    async def __call__(self) -> Self:
+        return self
 
 
 s3_crud = S3Crud()
@@ -2,18 +2,22 @@
 
 import asyncio
 import re
+from typing import Any, AsyncIterator, Mapping
 
 from boto3.dynamodb.conditions import Key
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
-from www.crud.base.db import DBCrud, TableKey
+from www.crud.base.db import DEFAULT_SCAN_LIMIT, DBCrud, TableKey
 from www.errors import InvalidNameError
+from www.utils.caching import TTLCache
 from www.utils.db import new_uuid
 
 
 class Robot(BaseModel):
     """Defines the data structure for a robot."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: str
     robot_name: str
     description: str
@@ -21,9 +25,26 @@ class Robot(BaseModel):
     class_id: str
 
 
+ROBOT_LIST_ADAPTER = TypeAdapter(list[Robot])
+
+# Robot names are between 3 and 63 characters long.
+ROBOT_NAME_RE = re.compile(r"\A[a-zA-Z0-9_-]{3,63}\Z")
+
+# Robots are read far more often than they are written, so lookups are cached
+# for a short time to avoid a DynamoDB round trip on every request.
+ROBOT_CACHE_SIZE = 10_000
+ROBOT_CACHE_SECONDS = 30
+
+
 class RobotCrud(DBCrud):
     """Defines the table holding information about individual robots."""
 
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.__by_id = TTLCache[str, dict[str, Any]](ROBOT_CACHE_SIZE, ROBOT_CACHE_SECONDS)
+        self.__by_name = TTLCache[tuple[str, str], Robot](ROBOT_CACHE_SIZE, ROBOT_CACHE_SECONDS)
+
     def _get_table_name(self) -> str:
         return "robot"
 
@@ -35,8 +56,29 @@ class RobotCrud(DBCrud):
     def get_gsis(cls) -> set[str]:
         return {"robot_name", "user_id", "class_id"}
 
+    def _get_unique_name_key(self, item: Mapping[str, Any]) -> str | None:
+        # Robot names only need to be unique for each user.
+        return f"robot:{item['user_id']}:{item['robot_name']}"
+
+    def clear_cache(self) -> None:
+        """Drops every cached robot."""
+        self.__by_id.clear()
+        self.__by_name.clear()
+
+    def _invalidate(self, robot_id: str, user_id: str, *robot_names: str) -> None:
+        self.__by_id.invalidate(robot_id)
+        for robot_name in robot_names:
+            self.__by_name.invalidate((robot_name, user_id))
+
+    async def _get_by_known_id(self, record_id: str, consistent_read: bool = False) -> dict[str, Any] | None:
+        if not consistent_read and (item := self.__by_id.get(record_id)) is not None:
+            return item
+        if (item := await super()._get_by_known_id(record_id, consistent_read)) is not None:
+            self.__by_id.put(record_id, item)
+        return item
+
     def _is_valid_name(self, robot_name: str) -> bool:
-        return len(robot_name) >= 3 and len(robot_name) < 64 and re.match(r"^[a-zA-Z0-9_-]+$", robot_name) is not None
+        return ROBOT_NAME_RE.match(robot_name) is not None
 
     def _is_valid_description(self, description: str | None) -> bool:
         return description is None or len(description) < 2048
@@ -66,7 +108,8 @@ class RobotCrud(DBCrud):
 
         robot_id = new_uuid()
 
-        robot = Robot(
+        # The inputs were validated above, so validation can be skipped.
+        robot = Robot.model_construct(
             id=robot_id,
             robot_name=robot_name,
             description="Empty description" if description is None else description,
@@ -74,18 +117,7 @@ class RobotCrud(DBCrud):
             class_id=class_id,
         )
 
-        # Check if the robot already exists.
-        existing_robot = await self.get_robot_by_name(robot_name, user_id)
-        if existing_robot is not None:
-            raise ValueError(f"Robot with name '{robot_name}' already exists")
-
-        table = await self.table
-        try:
-            await table.put_item(
-                Item=robot.model_dump(),
-                ConditionExpression="attribute_not_exists(robot_name)",
-            )
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+        if not await self._put_item_with_unique_name(robot.model_dump()):
             raise ValueError(f"Robot with name '{robot_name}' already exists")
 
         return robot
@@ -113,43 +145,46 @@ class RobotCrud(DBCrud):
         if new_description is not None and not self._is_valid_description(new_description):
             raise InvalidNameError("Invalid robot description")
 
-        table = await self.table
-
         # Populates values.
         old_robot_name = robot.robot_name
+        updates: dict[str, Any] = {}
         if new_robot_name is not None:
-            if old_robot_name != new_robot_name:
-                if (await self.get_robot_by_name(new_robot_name, user_id)) is not None:
-                    raise ValueError(f"Robot with name '{new_robot_name}' already exists")
-            robot.robot_name = new_robot_name
+            updates["robot_name"] = new_robot_name
 
         if new_description is not None:
-            robot.description = new_description
+            updates["description"] = new_description
 
+        old_robot, robot = robot, robot.model_copy(update=updates)
         try:
-            await table.update_item(
-                Key={"id": robot.id},
-                UpdateExpression="SET robot_name = :new_robot_name, description = :new_description",
-                ConditionExpression="attribute_not_exists(robot_name) OR robot_name = :old_robot_name",
-                ExpressionAttributeValues={
+            is_updated = await self._update_item_with_unique_name(
+                old_robot.model_dump(),
+                robot.model_dump(),
+                update_expression="SET robot_name = :new_robot_name, description = :new_description",
+                condition_expression="attribute_not_exists(robot_name) OR robot_name = :old_robot_name",
+                expression_attribute_values={
                     ":new_robot_name": robot.robot_name,
                     ":new_description": robot.description,
                     ":old_robot_name": old_robot_name,
                 },
             )
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+        finally:
+            self._invalidate(robot.id, robot.user_id, old_robot_name, robot.robot_name)
+
+        if not is_updated:
             raise ValueError(f"Robot with name '{new_robot_name}' already exists")
 
         return robot
 
     async def delete_robot(self, robot: Robot) -> None:
         """Deletes a robot from the database."""
-        table = await self.table
-        await table.delete_item(Key={"id": robot.id})
+        await self._delete_item_with_unique_name(robot.model_dump())
+        self._invalidate(robot.id, robot.user_id, robot.robot_name)
 
     async def get_robot_by_name(self, robot_name: str, user_id: str) -> Robot | None:
         """Gets a robot by name."""
-        table = await self.table
+        if (cached := self.__by_name.get((robot_name, user_id))) is not None:
+            return cached
+        table = self.table
         response = await table.query(
             IndexName=self.get_gsi_index_name("robot_name"),
             KeyConditionExpression=Key("robot_name").eq(robot_name),
@@ -159,30 +194,36 @@ class RobotCrud(DBCrud):
             return None
         if len(items) > 1:
             raise ValueError(f"Multiple robots with name '{robot_name}' found")
-        return Robot.model_validate(items[0])
+        robot = Robot.model_validate(items[0])
+        self.__by_name.put((robot_name, user_id), robot)
+        return robot
 
     async def get_robot_by_id(self, id: str, user_id: str) -> Robot | None:
         """Gets a robot by ID."""
-        table = await self.table
-        response = await table.get_item(Key={"id": id})
-        if (item := response.get("Item")) is None:
-            return None
-        robot = Robot.model_validate(item)
-        if robot.user_id != user_id:
+        item = await self._get_by_known_id(id)
+        if item is None or item["user_id"] != user_id:
             return None
-        return robot
+        return Robot.model_validate(item)
 
-    async def list_robots(self, user_id: str | None = None) -> list[Robot]:
-        """Gets all robots."""
-        table = await self.table
+    async def iter_robots(self, user_id: str | None = None) -> AsyncIterator[Robot]:
+        """Iterates over all robots, one page of results at a time."""
+        table = self.table
         if user_id is not None:
-            response = await table.query(
+            pages = self._paginate(
+                table.query,
                 IndexName=self.get_gsi_index_name("user_id"),
                 KeyConditionExpression=Key("user_id").eq(user_id),
+                Limit=DEFAULT_SCAN_LIMIT,
             )
         else:
-            response = await table.scan()
-        return [Robot.model_validate(item) for item in response.get("Items", [])]
+            pages = self._paginate(table.scan, Limit=DEFAULT_SCAN_LIMIT)
+        async for items in pages:
+            for robot in ROBOT_LIST_ADAPTER.validate_python(items):
+                yield robot
+
+    async def list_robots(self, user_id: str | None = None) -> list[Robot]:
+        """Gets all robots."""
+        return [robot async for robot in self.iter_robots(user_id)]
 
 
 robot_crud = RobotCrud()
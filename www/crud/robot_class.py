@@ -1,31 +1,46 @@
 """Defines the CRUD operations for the robot-class table."""
 
 import asyncio
+import itertools
 import re
 from decimal import Decimal
-from typing import Any
+from typing import Annotated, Any, AsyncIterator, Mapping
 
 from boto3.dynamodb.conditions import Key
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PlainSerializer, TypeAdapter
 
-from www.crud.base.db import DBCrud, TableKey
+from www.crud.base.db import DEFAULT_SCAN_LIMIT, DBCrud, TableKey
 from www.errors import InvalidNameError
+from www.utils.caching import TTLCache
 from www.utils.db import new_uuid
 
 
+def _float_to_json(value: float) -> str:
+    # Matches how DynamoDB's Decimals were serialized, e.g. "-90" not "-90.0".
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+# Stored as a float, but serialized to JSON as a string like the other
+# metadata numbers, which are Decimals.
+JSONDecimalFloat = Annotated[float, PlainSerializer(_float_to_json, return_type=str, when_used="json")]
+
+
 class JointMetadata(BaseModel):
+    # DynamoDB can't store NaN or infinite numbers.
+    model_config = ConfigDict(frozen=True, allow_inf_nan=False)
+
     id: int | None = None
-    kp: Decimal | None = None
-    kd: Decimal | None = None
-    armature: Decimal | None = None
-    friction: Decimal | None = None
-    offset: Decimal | None = None
+    kp: JSONDecimalFloat | None = None
+    kd: JSONDecimalFloat | None = None
+    armature: JSONDecimalFloat | None = None
+    friction: JSONDecimalFloat | None = None
+    offset: JSONDecimalFloat | None = None
     flipped: bool | None = None
     actuator_type: str | None = None
     nn_id: int | None = None
-    soft_torque_limit: Decimal | None = None
-    min_angle_deg: Decimal | None = None
-    max_angle_deg: Decimal | None = None
+    soft_torque_limit: JSONDecimalFloat | None = None
+    min_angle_deg: JSONDecimalFloat | None = None
+    max_angle_deg: JSONDecimalFloat | None = None
 
 
 class ActuatorMetadata(BaseModel):
@@ -56,6 +71,8 @@ class RobotURDFMetadata(BaseModel):
 class RobotClass(BaseModel):
     """Defines the data structure for a robot class."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: str
     class_name: str
     description: str
@@ -64,9 +81,79 @@ class RobotClass(BaseModel):
     num_downloads: int = 0
 
 
+def _to_ddb(value: Any) -> Any:  # noqa: ANN401
+    """Converts floats to Decimals, since DynamoDB doesn't accept floats."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_ddb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_ddb(v) for v in value]
+    return value
+
+
+ROBOT_CLASS_LIST_ADAPTER = TypeAdapter(list[RobotClass])
+
+# Robot classes are looked up on most requests, so lookups are cached for a
+# short time. Misses are only cached briefly, since the class may be created.
+ROBOT_CLASS_CACHE_SIZE = 4096
+ROBOT_CLASS_CACHE_SECONDS = 30
+ROBOT_CLASS_MISS_CACHE_SECONDS = 1
+ROBOT_CLASS_LIST_CACHE_SECONDS = 10
+
+# Robot class names are between 3 and 63 characters long.
+CLASS_NAME_RE = re.compile(r"\A[a-zA-Z0-9_-]{3,63}\Z")
+
+
+# Maps which of (class_name, description, metadata) are being updated to the
+# update expression, so the expressions don't need to be rebuilt per request.
+UPDATE_EXPRESSIONS: dict[tuple[bool, bool, bool], str] = {
+    (name, desc, meta): "SET "
+    + ", ".join(
+        f"{field} = :new_{field}"
+        for field, is_set in (("class_name", name), ("description", desc), ("metadata", meta))
+        if is_set
+    )
+    for name, desc, meta in itertools.product((False, True), repeat=3)
+    if name or desc or meta
+}
+UPDATE_CONDITION_EXPRESSION = "attribute_not_exists(class_name) OR class_name = :old_class_name"
+INCREMENT_DOWNLOADS_EXPRESSION = "SET num_downloads = if_not_exists(num_downloads, :zero) + :increment"
+
+
 class RobotClassCrud(DBCrud):
     """Defines the table holding information about classes of robots."""
 
+    def __init__(self) -> None:
+        super().__init__()
+
+        # Entries are wrapped in a tuple so that misses can be cached too.
+        self.__by_id = TTLCache[str, tuple[RobotClass | None]](ROBOT_CLASS_CACHE_SIZE, ROBOT_CLASS_CACHE_SECONDS)
+        self.__by_name = TTLCache[str, tuple[RobotClass | None]](ROBOT_CLASS_CACHE_SIZE, ROBOT_CLASS_CACHE_SECONDS)
+
+        # Listings are keyed by user ID, or None for all robot classes. Any
+        # write clears every listing and bumps the generation, so that a
+        # query which was already running when the write happened isn't cached.
+        self.__lists = TTLCache[str | None, list[RobotClass]](ROBOT_CLASS_CACHE_SIZE, ROBOT_CLASS_LIST_CACHE_SECONDS)
+        self.__list_tasks: dict[str | None, asyncio.Task[list[RobotClass]]] = {}
+        self.__list_generation = 0
+
+    def clear_cache(self) -> None:
+        """Drops every cached robot class and listing."""
+        self.__by_id.clear()
+        self.__by_name.clear()
+        self.__lists.clear()
+        self.__list_tasks.clear()
+        self.__list_generation += 1
+
+    def _invalidate(self, robot_class_id: str, *class_names: str) -> None:
+        self.__by_id.invalidate(robot_class_id)
+        for class_name in class_names:
+            self.__by_name.invalidate(class_name)
+        self.__lists.clear()
+        self.__list_tasks.clear()
+        self.__list_generation += 1
+
     def _get_table_name(self) -> str:
         return "robot-class"
 
@@ -78,10 +165,15 @@ class RobotClassCrud(DBCrud):
     def get_gsis(cls) -> set[str]:
         return {"class_name", "user_id"}
 
-    def _is_valid_name(self, class_name: str) -> bool:
-        return len(class_name) >= 3 and len(class_name) < 64 and re.match(r"^[a-zA-Z0-9_-]+$", class_name) is not None
+    def _get_unique_name_key(self, item: Mapping[str, Any]) -> str | None:
+        return f"robot-class:{item['class_name']}"
+
+    @staticmethod
+    def _is_valid_name(class_name: str) -> bool:
+        return CLASS_NAME_RE.match(class_name) is not None
 
-    def _is_valid_description(self, description: str | None) -> bool:
+    @staticmethod
+    def _is_valid_description(description: str | None) -> bool:
         return description is None or len(description) < 2048
 
     def _is_valid_metadata(self, metadata: RobotURDFMetadata | None) -> bool:
@@ -116,7 +208,8 @@ class RobotClassCrud(DBCrud):
 
         robot_class_id = new_uuid()
 
-        robot_class = RobotClass(
+        # The inputs were validated above, so validation can be skipped.
+        robot_class = RobotClass.model_construct(
             id=robot_class_id,
             class_name=class_name,
             description="Empty description" if description is None else description,
@@ -124,19 +217,9 @@ class RobotClassCrud(DBCrud):
             num_downloads=0,
         )
 
-        # Check if the robot class already exists.
-        existing_robot_class = await self.get_robot_class_by_name(class_name)
-        if existing_robot_class is not None:
-            raise ValueError(f"Robot class with name '{class_name}' already exists")
-
-        table = await self.table
-        try:
-            await table.put_item(
-                Item=robot_class.model_dump(),
-                ConditionExpression="attribute_not_exists(class_name)",
-            )
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+        if not await self._put_item_with_unique_name(robot_class.model_dump()):
             raise ValueError(f"Robot class with name '{class_name}' already exists")
+        self._invalidate(robot_class_id, class_name)
 
         return robot_class
 
@@ -158,6 +241,8 @@ class RobotClassCrud(DBCrud):
         Returns:
             The robot class that was updated.
         """
+        if new_class_name is None and new_description is None and new_metadata is None:
+            raise ValueError("No updates to the robot class")
         if new_class_name is not None and not self._is_valid_name(new_class_name):
             raise InvalidNameError(f"Invalid robot class name: {new_class_name}")
         if new_description is not None and not self._is_valid_description(new_description):
@@ -165,95 +250,132 @@ class RobotClassCrud(DBCrud):
         if new_metadata is not None and not self._is_valid_metadata(new_metadata):
             raise InvalidNameError("Invalid robot class metadata")
 
-        table = await self.table
-
-        update_expression_parts: list[str] = []
         expression_attribute_values: dict[str, Any] = {}
+        updates: dict[str, Any] = {}
 
         # Populates values.
+        old_robot_class = robot_class.model_dump()
         old_class_name = robot_class.class_name
         expression_attribute_values[":old_class_name"] = old_class_name
         if new_class_name is not None:
-            if old_class_name != new_class_name:
-                if (await self.get_robot_class_by_name(new_class_name)) is not None:
-                    raise ValueError(f"Robot class with name '{new_class_name}' already exists")
-            robot_class.class_name = new_class_name
-            update_expression_parts.append("class_name = :new_class_name")
+            updates["class_name"] = new_class_name
             expression_attribute_values[":new_class_name"] = new_class_name
 
         if new_description is not None:
-            robot_class.description = new_description
-            update_expression_parts.append("description = :new_description")
+            updates["description"] = new_description
             expression_attribute_values[":new_description"] = new_description
 
         if new_metadata is not None:
-            update_expression_parts.append("metadata = :new_metadata")
-            new_metadata_dict = {k: v for k, v in new_metadata.model_dump().items() if v is not None}
-            expression_attribute_values[":new_metadata"] = new_metadata_dict
-
-        if len(update_expression_parts) == 0:
-            breakpoint()
-            raise ValueError("No updates to the robot class")
+            updates["metadata"] = new_metadata
+            expression_attribute_values[":new_metadata"] = _to_ddb(new_metadata.model_dump(exclude_none=True))
 
+        # Moves the unique name and updates the robot class in one transaction.
+        new_robot_class = robot_class.model_copy(update=updates)
         try:
-            await table.update_item(
-                Key={"id": robot_class.id},
-                UpdateExpression="SET " + ", ".join(update_expression_parts),
-                ConditionExpression="attribute_not_exists(class_name) OR class_name = :old_class_name",
-                ExpressionAttributeValues=expression_attribute_values,
+            is_updated = await self._update_item_with_unique_name(
+                old_robot_class,
+                new_robot_class.model_dump(),
+                update_expression=UPDATE_EXPRESSIONS[
+                    new_class_name is not None,
+                    new_description is not None,
+                    new_metadata is not None,
+                ],
+                condition_expression=UPDATE_CONDITION_EXPRESSION,
+                expression_attribute_values=expression_attribute_values,
             )
-        except table.meta.client.exceptions.ConditionalCheckFailedException:
+        finally:
+            self._invalidate(robot_class.id, old_class_name, new_robot_class.class_name)
+
+        if not is_updated:
             raise ValueError(f"Robot class with name '{new_class_name}' already exists")
 
-        return robot_class
+        return new_robot_class
 
     async def delete_robot_class(self, robot_class: RobotClass) -> None:
         """Deletes a robot class from the database."""
-        table = await self.table
-        await table.delete_item(Key={"id": robot_class.id})
+        await self._delete_item_with_unique_name(robot_class.model_dump())
+        self._invalidate(robot_class.id, robot_class.class_name)
 
     async def get_robot_class_by_name(self, class_name: str) -> RobotClass | None:
         """Gets a robot class by name."""
-        table = await self.table
+        if (cached := self.__by_name.get(class_name)) is not None:
+            return cached[0]
+        table = self.table
         response = await table.query(
             IndexName=self.get_gsi_index_name("class_name"),
             KeyConditionExpression=Key("class_name").eq(class_name),
         )
         if (items := response.get("Items", [])) == []:
+            self.__by_name.put(class_name, (None,), ttl=ROBOT_CLASS_MISS_CACHE_SECONDS)
             return None
         if len(items) > 1:
             raise ValueError(f"Multiple robot classes with name '{class_name}' found")
-        return RobotClass.model_validate(items[0])
+        robot_class = RobotClass.model_validate(items[0])
+        self.__by_name.put(class_name, (robot_class,))
+        return robot_class
 
     async def get_robot_class_by_id(self, id: str) -> RobotClass | None:
         """Gets a robot class by ID."""
-        table = await self.table
-        response = await table.get_item(Key={"id": id})
-        if (item := response.get("Item")) is None:
+        if (cached := self.__by_id.get(id)) is not None:
+            return cached[0]
+        if (item := await self._get_by_known_id(id)) is None:
+            self.__by_id.put(id, (None,), ttl=ROBOT_CLASS_MISS_CACHE_SECONDS)
             return None
-        return RobotClass.model_validate(item)
+        robot_class = RobotClass.model_validate(item)
+        self.__by_id.put(id, (robot_class,))
+        return robot_class
 
-    async def list_robot_classes(self, user_id: str | None = None) -> list[RobotClass]:
-        """Gets all robot classes."""
-        table = await self.table
+    async def iter_robot_classes(self, user_id: str | None = None) -> AsyncIterator[RobotClass]:
+        """Iterates over all robot classes, one page of results at a time."""
+        table = self.table
         if user_id is not None:
-            response = await table.query(
+            pages = self._paginate(
+                table.query,
                 IndexName=self.get_gsi_index_name("user_id"),
                 KeyConditionExpression=Key("user_id").eq(user_id),
+                Limit=DEFAULT_SCAN_LIMIT,
             )
         else:
-            response = await table.scan()
-        return [RobotClass.model_validate(item) for item in response.get("Items", [])]
+            pages = self._paginate(table.scan, Limit=DEFAULT_SCAN_LIMIT)
+        async for items in pages:
+            for robot_class in ROBOT_CLASS_LIST_ADAPTER.validate_python(items):
+                yield robot_class
+
+    async def _query_robot_classes(self, user_id: str | None) -> list[RobotClass]:
+        generation = self.__list_generation
+        robot_classes = [robot_class async for robot_class in self.iter_robot_classes(user_id)]
+        if generation == self.__list_generation:
+            self.__lists.put(user_id, robot_classes)
+        return robot_classes
+
+    async def list_robot_classes(self, user_id: str | None = None) -> list[RobotClass]:
+        """Gets all robot classes."""
+        if (cached := self.__lists.get(user_id)) is not None:
+            return list(cached)
+
+        # Concurrent misses for the same listing share a single query.
+        if (task := self.__list_tasks.get(user_id)) is None:
+            task = asyncio.create_task(self._query_robot_classes(user_id))
+            self.__list_tasks[user_id] = task
+
+            def on_done(done: asyncio.Task[list[RobotClass]]) -> None:
+                if self.__list_tasks.get(user_id) is done:
+                    del self.__list_tasks[user_id]
+
+            task.add_done_callback(on_done)
+
+        return list(await asyncio.shield(task))
 
     async def increment_downloads(self, robot_class: RobotClass) -> None:
         """Increments the number of downloads for a robot class."""
-        table = await self.table
+        table = self.table
         await table.update_item(
             Key={"id": robot_class.id},
-            UpdateExpression="SET num_downloads = if_not_exists(num_downloads, :zero) + :increment",
+            UpdateExpression=INCREMENT_DOWNLOADS_EXPRESSION,
             ExpressionAttributeValues={":increment": 1, ":zero": 0},
             ReturnValues="NONE",
         )
+        self._invalidate(robot_class.id, robot_class.class_name)
 
 
 robot_class_crud = RobotClassCrud()
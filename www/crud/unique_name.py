@@ -0,0 +1,18 @@
+"""Defines the table which enforces unique names in the other tables."""
+
+from www.crud.base.db import UNIQUE_NAME_TABLE, DBCrud
+
+
+class UniqueNameCrud(DBCrud):
+    """Defines the table holding one sentinel item per claimed name.
+
+    The items in this table are written and deleted by the other CRUDs, in
+    the same transactions as their own items, so this class only needs to
+    create the table.
+    """
+
+    def _get_table_name(self) -> str:
+        return UNIQUE_NAME_TABLE
+
+
+unique_name_crud = UniqueNameCrud()
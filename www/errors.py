@@ -1,7 +1,12 @@
 """Defines common errors used by the application."""
 
-from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+import functools
+from typing import cast
+
+import orjson
+from fastapi import FastAPI, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 
 from www.settings import env
 
@@ -15,51 +20,61 @@ class ActionNotAllowedError(ValueError): ...
 class InvalidNameError(ValueError): ...
 
 
-def add_exception_handlers(app: FastAPI) -> None:
-    """Adds the handlers to the FastAPI app."""
-    show_full_error = env.site.is_test_environment
+@functools.cache
+def _show_full_error() -> bool:
+    # Settings are loaded lazily, so this can't be read at import time.
+    return env.site.is_test_environment
 
-    def protected_str(exc: Exception) -> str:
-        if show_full_error:
-            return str(exc)
-        return "The request was invalid."
 
-    async def value_error_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"message": "The request was invalid.", "detail": protected_str(exc)},
-        )
+def _protected_str(exc: Exception) -> str:
+    return str(exc) if _show_full_error() else "The request was invalid."
 
-    app.add_exception_handler(ValueError, value_error_exception_handler)
 
-    async def runtime_error_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"message": "An internal error occurred.", "detail": protected_str(exc)},
-        )
+def _error_response(status_code: int, message: str, detail: str) -> Response:
+    return Response(
+        content=orjson.dumps({"message": message, "detail": detail}),
+        status_code=status_code,
+        media_type="application/json",
+    )
 
-    app.add_exception_handler(RuntimeError, runtime_error_exception_handler)
 
-    async def item_not_found_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"message": "Item not found.", "detail": str(exc)},
-        )
+async def value_error_exception_handler(request: Request, exc: Exception) -> Response:
+    return _error_response(status.HTTP_400_BAD_REQUEST, "The request was invalid.", _protected_str(exc))
 
-    app.add_exception_handler(ItemNotFoundError, item_not_found_exception_handler)
 
-    async def action_not_allowed_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"message": "Action not allowed.", "detail": str(exc)},
-        )
+async def runtime_error_exception_handler(request: Request, exc: Exception) -> Response:
+    return _error_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "An internal error occurred.", _protected_str(exc))
 
-    app.add_exception_handler(ActionNotAllowedError, action_not_allowed_exception_handler)
 
-    async def invalid_name_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"message": "Invalid name.", "detail": str(exc)},
-        )
+async def item_not_found_exception_handler(request: Request, exc: Exception) -> Response:
+    return _error_response(status.HTTP_404_NOT_FOUND, "Item not found.", str(exc))
+
+
+async def action_not_allowed_exception_handler(request: Request, exc: Exception) -> Response:
+    return _error_response(status.HTTP_403_FORBIDDEN, "Action not allowed.", str(exc))
+
 
+async def invalid_name_exception_handler(request: Request, exc: Exception) -> Response:
+    return _error_response(status.HTTP_400_BAD_REQUEST, "Invalid name.", str(exc))
+
+
+async def request_validation_exception_handler(request: Request, exc: Exception) -> Response:
+    # Same body as FastAPI's default handler, except that orjson writes
+    # non-finite inputs like NaN (which the standard library refuses to
+    # encode) as null, rather than failing to render the error at all.
+    errors = cast(RequestValidationError, exc).errors()
+    return Response(
+        content=orjson.dumps({"detail": jsonable_encoder(errors)}),
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        media_type="application/json",
+    )
+
+
+def add_exception_handlers(app: FastAPI) -> None:
+    """Adds the handlers to the FastAPI app."""
+    app.add_exception_handler(ValueError, value_error_exception_handler)
+    app.add_exception_handler(RuntimeError, runtime_error_exception_handler)
+    app.add_exception_handler(ItemNotFoundError, item_not_found_exception_handler)
+    app.add_exception_handler(ActionNotAllowedError, action_not_allowed_exception_handler)
     app.add_exception_handler(InvalidNameError, invalid_name_exception_handler)
+    app.add_exception_handler(RequestValidationError, request_validation_exception_handler)
@@ -1,12 +1,29 @@
 """Defines the main entrypoint for the FastAPI app."""
 
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
 import uvicorn
 from fastapi import FastAPI
 
+from www import crud
 from www.auth import COGNITO_CLIENT_ID
 from www.errors import add_exception_handlers
-from www.middleware import add_middleware
+from www.middleware import get_middleware
 from www.routers import add_routers
+from www.utils.email import smtp_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # Keeps a single set of AWS clients alive for the lifetime of the app.
+    await crud.startup()
+    try:
+        yield
+    finally:
+        await crud.shutdown()
+        await smtp_pool.close()
+
 
 app = FastAPI(
     title="K-Scale",
@@ -19,9 +36,10 @@ app = FastAPI(
         "usePkceWithAuthorizationCodeGrant": True,
         "scopes": "openid email profile",
     },
+    lifespan=lifespan,
+    middleware=get_middleware(),
 )
 
-add_middleware(app)
 add_exception_handlers(app)
 add_routers(app)
 
@@ -1,26 +1,86 @@
 """Defines the middleware for the FastAPI app."""
 
-from fastapi import FastAPI
+import binascii
+from base64 import b64decode, b64encode
+
+import orjson
+from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.sessions import Session, SessionMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import Message, Receive, Scope, Send
 
 from www.settings import env
 
 
-def add_middleware(app: FastAPI) -> None:
-    """Adds the middleware to the FastAPI app."""
-    # Adds CORS middleware.
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-
-    # Add authentication middleware.
-    app.add_middleware(
-        SessionMiddleware,
-        secret_key=env.middleware.secret_key,
-        max_age=24 * 60 * 60,  # 1 day
-    )
+class ORJSONSessionMiddleware(SessionMiddleware):
+    """Session middleware which encodes the session cookie using `orjson`.
+
+    This is the same as Starlette's `SessionMiddleware`, except that the
+    session payload is serialized with `orjson` instead of the standard
+    library `json` module, and the cookie is only re-signed when the session
+    was modified while handling the request.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        initial_session_was_empty = True
+
+        if (cookie := connection.cookies.get(self.session_cookie)) is not None:
+            try:
+                data = self.signer.unsign(cookie.encode("utf-8"), max_age=self.max_age)
+                scope["session"] = Session(orjson.loads(b64decode(data)))
+                initial_session_was_empty = False
+            except (BadSignature, binascii.Error, orjson.JSONDecodeError):
+                scope["session"] = Session()
+        else:
+            scope["session"] = Session()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session: Session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session.accessed:
+                    headers.add_vary_header("Cookie")
+                if session.modified and session:
+                    data = self.signer.sign(b64encode(orjson.dumps(session))).decode("utf-8")
+                    max_age = f"Max-Age={self.max_age}; " if self.max_age else ""
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}={data}; path={self.path}; {max_age}{self.security_flags}",
+                    )
+                elif session.modified and not initial_session_was_empty:
+                    expires = "expires=Thu, 01 Jan 1970 00:00:00 GMT; "
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}=null; path={self.path}; {expires}{self.security_flags}",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def get_middleware() -> list[Middleware]:
+    """Returns the middleware stack for the FastAPI app, outermost first."""
+    return [
+        # Adds authentication middleware.
+        Middleware(
+            ORJSONSessionMiddleware,
+            secret_key=env.middleware.secret_key,
+            max_age=24 * 60 * 60,  # 1 day
+        ),
+        # Adds CORS middleware.
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+    ]
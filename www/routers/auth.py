@@ -107,9 +107,12 @@ class OICDInfo(BaseModel):
     client_id: str
 
 
+OICD_INFO = OICDInfo(
+    authority=COGNITO_AUTHORITY,
+    client_id=COGNITO_CLIENT_ID,
+)
+
+
 @router.get("/oicd")
 async def oicd_info() -> OICDInfo:
-    return OICDInfo(
-        authority=COGNITO_AUTHORITY,
-        client_id=COGNITO_CLIENT_ID,
-    )
+    return OICD_INFO
@@ -2,11 +2,11 @@
 
 from typing import Annotated, Self
 
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, Response
 from pydantic import BaseModel
 
-from www.auth import User, require_permissions, require_user
-from www.crud.robot import Robot, RobotCrud, robot_crud
+from www.auth import User, require_upload, require_user
+from www.crud.robot import ROBOT_LIST_ADAPTER, Robot, RobotCrud, robot_crud
 from www.crud.robot_class import RobotClass, RobotClassCrud, robot_class_crud
 from www.errors import ActionNotAllowedError, ItemNotFoundError
 
@@ -31,11 +31,25 @@ class RobotResponse(BaseModel):
         )
 
 
-@router.get("/")
+def _robot_list_response(robots: list[Robot]) -> Response:
+    # The robots were validated when they were read, so they are serialized
+    # directly rather than being validated again by FastAPI.
+    return Response(content=ROBOT_LIST_ADAPTER.dump_json(robots), media_type="application/json")
+
+
+@router.get("/", response_model=list[Robot])
 async def get_robots(
     crud: RobotCrud = Depends(robot_crud),
-) -> list[Robot]:
-    return await crud.list_robots()
+) -> Response:
+    return _robot_list_response(await crud.list_robots())
+
+
+async def _get_class_for_robot(robot: Robot, cls_crud: RobotClassCrud) -> RobotClass:
+    # Robot classes are cached by ID, so this usually avoids a second round trip.
+    robot_class = await cls_crud.get_robot_class_by_id(robot.class_id)
+    if robot_class is None:
+        raise ItemNotFoundError(f"Robot class '{robot.class_id}' not found")
+    return robot_class
 
 
 async def _get_robot_and_class_by_id(
@@ -47,10 +61,7 @@ async def _get_robot_and_class_by_id(
     robot = await crud.get_robot_by_id(id, user.id)
     if robot is None:
         raise ItemNotFoundError(f"Robot '{id}' not found")
-    robot_class = await cls_crud.get_robot_class_by_id(robot.class_id)
-    if robot_class is None:
-        raise ItemNotFoundError(f"Robot class '{robot.class_id}' not found")
-    return robot, robot_class
+    return robot, await _get_class_for_robot(robot, cls_crud)
 
 
 async def _get_base_robot_by_name(
@@ -65,28 +76,17 @@ async def _get_base_robot_by_name(
 
 
 async def _get_robot_and_class_by_name(
-    robot_name: str,
-    user: Annotated[User, Depends(require_user)],
-    crud: Annotated[RobotCrud, Depends(robot_crud)],
+    robot: Annotated[Robot, Depends(_get_base_robot_by_name)],
     cls_crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
 ) -> tuple[Robot, RobotClass]:
-    robot = await crud.get_robot_by_name(robot_name, user.id)
-    if robot is None:
-        raise ItemNotFoundError(f"Robot '{robot_name}' not found")
-    robot_class = await cls_crud.get_robot_class_by_id(robot.class_id)
-    if robot_class is None:
-        raise ItemNotFoundError(f"Robot class '{robot.class_id}' not found")
-    return robot, robot_class
+    return robot, await _get_class_for_robot(robot, cls_crud)
 
 
 @router.get("/name/{robot_name}")
 async def get_robot_by_name(
-    robot_name: str,
-    user: Annotated[User, Depends(require_user)],
-    crud: Annotated[RobotCrud, Depends(robot_crud)],
-    cls_crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
+    robot_tuple: Annotated[tuple[Robot, RobotClass], Depends(_get_robot_and_class_by_name)],
 ) -> RobotResponse:
-    robot, robot_class = await _get_robot_and_class_by_name(robot_name, user, crud, cls_crud)
+    robot, robot_class = robot_tuple
     return RobotResponse.from_robot(robot, robot_class)
 
 
@@ -101,16 +101,16 @@ async def get_robot_by_id(
     return RobotResponse.from_robot(robot, robot_class)
 
 
-@router.get("/user/{user_id}")
+@router.get("/user/{user_id}", response_model=list[Robot])
 async def get_robots_for_user(
     user_id: str,
     user: Annotated[User, Depends(require_user)],
     crud: Annotated[RobotCrud, Depends(robot_crud)],
-) -> list[Robot]:
+) -> Response:
     if user_id.lower() == "me":
-        return await crud.list_robots(user.id)
+        return _robot_list_response(await crud.list_robots(user.id))
     else:
-        return await crud.list_robots(user_id)
+        return _robot_list_response(await crud.list_robots(user_id))
 
 
 class AddRobotRequest(BaseModel):
@@ -121,7 +121,7 @@ class AddRobotRequest(BaseModel):
 @router.put("/{robot_name}")
 async def add_robot(
     robot_name: str,
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     r_crud: Annotated[RobotCrud, Depends(robot_crud)],
     rc_crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
     request: Annotated[AddRobotRequest, Body()],
@@ -140,7 +140,7 @@ class UpdateRobotRequest(BaseModel):
 
 @router.post("/{robot_name}")
 async def update_robot(
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     existing_robot_tuple: Annotated[tuple[Robot, RobotClass], Depends(_get_robot_and_class_by_name)],
     crud: Annotated[RobotCrud, Depends(robot_crud)],
     request: Annotated[UpdateRobotRequest, Body()],
@@ -1,14 +1,15 @@
 """Defines the API endpoint for managing robot classes."""
 
-import asyncio
+import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, Response
 from pydantic import BaseModel
 
-from www.auth import User, require_permissions, require_user
+from www.auth import User, require_upload, require_user
 from www.crud.base.s3 import S3Crud, s3_crud
 from www.crud.robot_class import (
+    ROBOT_CLASS_LIST_ADAPTER,
     RobotClass,
     RobotClassCrud,
     RobotURDFMetadata,
@@ -16,23 +17,35 @@ from www.crud.robot_class import (
 )
 from www.errors import ActionNotAllowedError, ItemNotFoundError
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# URDFs are uploaded as gzipped tarballs.
+URDF_CONTENT_TYPES = frozenset({"application/x-compressed-tar"})
+URDF_EXTENSIONS = (".tgz",)
+
 
 def urdf_s3_key(robot_class: RobotClass) -> str:
-    return f"urdfs/{robot_class.id}/robot.tgz"
+    return "urdfs/" + robot_class.id + "/robot.tgz"
 
 
 def kernel_image_s3_key(robot_class: RobotClass) -> str:
-    return f"kernel_images/{robot_class.id}/kernel.png"
+    return "kernel_images/" + robot_class.id + "/kernel.png"
+
 
+def _robot_class_list_response(robot_classes: list[RobotClass]) -> Response:
+    # The robot classes were validated when they were read, so they are
+    # serialized directly rather than being validated again by FastAPI.
+    return Response(content=ROBOT_CLASS_LIST_ADAPTER.dump_json(robot_classes), media_type="application/json")
 
-@router.get("/")
+
+@router.get("/", response_model=list[RobotClass])
 async def get_robot_classes(
     crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
-) -> list[RobotClass]:
+) -> Response:
     """Gets all robot classes."""
-    return await crud.list_robot_classes()
+    return _robot_class_list_response(await crud.list_robot_classes())
 
 
 @router.get("/name/{class_name}")
@@ -47,17 +60,17 @@ async def get_robot_class_by_name(
     return robot_class
 
 
-@router.get("/user/{user_id}")
+@router.get("/user/{user_id}", response_model=list[RobotClass])
 async def get_robot_classes_for_user(
     user_id: str,
     user: Annotated[User, Depends(require_user)],
     crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
-) -> list[RobotClass]:
+) -> Response:
     """Gets a robot class."""
     if user_id.lower() == "me":
-        return await crud.list_robot_classes(user.id)
+        return _robot_class_list_response(await crud.list_robot_classes(user.id))
     else:
-        return await crud.list_robot_classes(user_id)
+        return _robot_class_list_response(await crud.list_robot_classes(user_id))
 
 
 class AddRobotClassRequest(BaseModel):
@@ -67,7 +80,7 @@ class AddRobotClassRequest(BaseModel):
 @router.put("/{class_name}")
 async def add_robot_class(
     class_name: str,
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
     request: Annotated[AddRobotClassRequest, Body()],
 ) -> RobotClass:
@@ -83,7 +96,7 @@ class UpdateRobotClassRequest(BaseModel):
 
 @router.post("/{class_name}")
 async def update_robot_class(
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     existing_robot_class: Annotated[RobotClass, Depends(get_robot_class_by_name)],
     crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
     request: Annotated[UpdateRobotClassRequest, Body()],
@@ -92,6 +105,10 @@ async def update_robot_class(
     if not user.is_admin and existing_robot_class.user_id != user.id:
         raise ActionNotAllowedError("You are not the owner of this robot class")
 
+    # Nothing to change, so there's no need to write to the database.
+    if request.new_class_name is None and request.new_description is None and request.new_metadata is None:
+        return existing_robot_class
+
     return await crud.update_robot_class(
         robot_class=existing_robot_class,
         new_class_name=request.new_class_name,
@@ -102,7 +119,7 @@ async def update_robot_class(
 
 @router.delete("/{class_name}")
 async def delete_robot_class(
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     robot_class: Annotated[RobotClass, Depends(get_robot_class_by_name)],
     db_crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
     fs_crud: Annotated[S3Crud, Depends(s3_crud)],
@@ -110,9 +127,15 @@ async def delete_robot_class(
     """Deletes a robot class."""
     if not user.is_admin and robot_class.user_id != user.id:
         raise ActionNotAllowedError("You are not the owner of this robot class")
-    s3_key = urdf_s3_key(robot_class)
-    await fs_crud.delete_from_s3(s3_key)
     await db_crud.delete_robot_class(robot_class)
+
+    # The record is deleted first, so that a failed cleanup only leaves an
+    # orphaned URDF behind rather than a class pointing at a missing file.
+    s3_key = urdf_s3_key(robot_class)
+    try:
+        await fs_crud.delete_from_s3(s3_key)
+    except Exception:
+        logger.exception("Failed to delete URDF %s for robot class %s", s3_key, robot_class.id)
     return True
 
 
@@ -129,13 +152,14 @@ async def get_urdf_for_robot(
     robot_class: Annotated[RobotClass, Depends(get_robot_class_by_name)],
     db_crud: Annotated[RobotClassCrud, Depends(robot_class_crud)],
     fs_crud: Annotated[S3Crud, Depends(s3_crud)],
+    background_tasks: BackgroundTasks,
 ) -> RobotDownloadURDFResponse:
     s3_key = urdf_s3_key(robot_class)
-    _, url, md5_hash = await asyncio.gather(
-        db_crud.increment_downloads(robot_class),
-        fs_crud.generate_presigned_download_url(s3_key),
-        fs_crud.get_file_hash(s3_key),
-    )
+    url = await fs_crud.generate_presigned_download_url(s3_key)
+    md5_hash = await fs_crud.get_file_hash(s3_key)
+    # The download counter doesn't affect the response, so it is updated
+    # after the response has been sent.
+    background_tasks.add_task(db_crud.increment_downloads, robot_class)
     return RobotDownloadURDFResponse(url=url, md5_hash=md5_hash)
 
 
@@ -153,14 +177,14 @@ class RobotUploadURDFResponse(BaseModel):
 @urdf_router.put("/{class_name}")
 async def upload_urdf_for_robot(
     robot_class: Annotated[RobotClass, Depends(get_robot_class_by_name)],
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     request: Annotated[RobotUploadURDFRequest, Body()],
     fs_crud: Annotated[S3Crud, Depends(s3_crud)],
 ) -> RobotUploadURDFResponse:
     # Checks that the content type is .tgz file.
-    if request.content_type != "application/x-compressed-tar":
+    if request.content_type not in URDF_CONTENT_TYPES:
         raise ValueError(f"Invalid content type: {request.content_type}")
-    if not request.filename.lower().endswith(".tgz"):
+    if not request.filename.lower().endswith(URDF_EXTENSIONS):
         raise ValueError(f"Invalid filename: {request.filename}")
     if not user.is_admin and robot_class.user_id != user.id:
         raise ActionNotAllowedError("You are not the owner of this robot class")
@@ -172,7 +196,7 @@ async def upload_urdf_for_robot(
 @urdf_router.delete("/{class_name}")
 async def delete_urdf_for_robot(
     robot_class: Annotated[RobotClass, Depends(get_robot_class_by_name)],
-    user: Annotated[User, Depends(require_permissions({"upload"}))],
+    user: Annotated[User, Depends(require_upload)],
     fs_crud: Annotated[S3Crud, Depends(s3_crud)],
 ) -> bool:
     if not user.is_admin and robot_class.user_id != user.id:
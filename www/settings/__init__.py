@@ -4,7 +4,7 @@ import os
 from pathlib import Path
 from typing import Any, Callable, Generic, TypeVar, cast
 
-from omegaconf import OmegaConf
+from omegaconf import DictConfig, OmegaConf
 
 from www.settings.environment import EnvironmentSettings
 
@@ -17,12 +17,37 @@ def _check_exists(path: Path) -> Path:
     return path
 
 
+class _ResolvedSettings:
+    """Caches each resolved config value on first access.
+
+    OmegaConf re-resolves interpolations on every attribute access. Here,
+    each value is resolved once and stored on the instance, so later reads
+    are plain attribute lookups. Values are resolved lazily rather than all
+    up front, so settings which can't be resolved (for example, unset
+    environment variables) still only raise an error when they are used.
+    """
+
+    def __init__(self, config: DictConfig) -> None:
+        super().__init__()
+
+        self._config = config
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = getattr(self._config, name)
+        if isinstance(value, DictConfig):
+            value = _ResolvedSettings(value)
+        setattr(self, name, value)
+        return value
+
+
 def _load_settings(environment: str) -> EnvironmentSettings:
     base_dir = (Path(__file__).parent / "configs").resolve()
     config_path = _check_exists(base_dir / f"{environment}.yaml")
     config = OmegaConf.load(config_path)
     config = OmegaConf.merge(OmegaConf.structured(EnvironmentSettings), config)
-    return cast(EnvironmentSettings, config)
+    return cast(EnvironmentSettings, _ResolvedSettings(cast(DictConfig, config)))
 
 
 def _load_environment_settings() -> EnvironmentSettings:
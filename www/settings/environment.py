@@ -67,6 +67,10 @@ class AwsSettings:
     dynamodb: DynamoSettings = field(default_factory=DynamoSettings)
     s3: S3Settings = field(default_factory=S3Settings)
     cloudfront: CloudFrontSettings = field(default_factory=CloudFrontSettings)
+    max_pool_connections: int = field(default=100)
+    max_retry_attempts: int = field(default=5)
+    connect_timeout: float = field(default=3.0)
+    read_timeout: float = field(default=10.0)
 
 
 @dataclass
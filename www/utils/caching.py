@@ -2,14 +2,32 @@
 
 import datetime
 import functools
+import time
 from collections import OrderedDict
-from typing import Awaitable, Callable, Generic, Hashable, ParamSpec, TypeVar, overload
+from typing import Awaitable, Callable, Generic, Hashable, ParamSpec, Protocol, TypeVar, cast, overload
 
 Tk = TypeVar("Tk", bound=Hashable)
 Tv = TypeVar("Tv")
+Tv_co = TypeVar("Tv_co", covariant=True)
 P = ParamSpec("P")
 
 
+class CachedFunction(Protocol[P, Tv_co]):
+    """A function whose results are cached, and can be cleared."""
+
+    cache_clear: Callable[[], None]
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> Tv_co: ...
+
+
+class CachedAsyncFunction(Protocol[P, Tv_co]):
+    """An async function whose results are cached, and can be cleared."""
+
+    cache_clear: Callable[[], None]
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> Awaitable[Tv_co]: ...
+
+
 class LRUCache(Generic[Tk, Tv]):
     def __init__(self, capacity: int) -> None:
         super().__init__()
@@ -53,8 +71,51 @@ class LRUCache(Generic[Tk, Tv]):
     def __setitem__(self, key: Tk, value: Tv) -> None:
         self.put(key, value)
 
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+class TTLCache(Generic[Tk, Tv]):
+    """An LRU cache whose entries expire after some number of seconds.
+
+    Args:
+        capacity: The maximum number of entries to keep.
+        ttl: The default number of seconds an entry stays valid for.
+    """
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        super().__init__()
+
+        self.cache = LRUCache[Tk, tuple[float, Tv]](capacity)
+        self.ttl = ttl
+
+    def get(self, key: Tk) -> Tv | None:
+        if (item := self.cache.get(key)) is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self.cache.pop(key)
+            return None
+        return value
+
+    def __contains__(self, key: Tk) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def put(self, key: Tk, value: Tv, ttl: float | None = None) -> None:
+        self.cache.put(key, (time.monotonic() + (self.ttl if ttl is None else ttl), value))
+
+    def invalidate(self, key: Tk) -> None:
+        if key in self.cache:
+            self.cache.pop(key)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
 
-def cache_result(num_seconds: float, capacity: int = 2**16) -> Callable[[Callable[P, Tv]], Callable[P, Tv]]:
+def cache_result(num_seconds: float, capacity: int = 2**16) -> Callable[[Callable[P, Tv]], CachedFunction[P, Tv]]:
     """Cache the result of a function for a certain number of seconds.
 
     Usage:
@@ -70,10 +131,11 @@ def cache_result(num_seconds: float, capacity: int = 2**16) -> Callable[[Callabl
         capacity: The number of results to cache.
 
     Returns:
-        A decorator that caches the result of the function.
+        A decorator that caches the result of the function. The cached
+        results can be dropped by calling ``cache_clear`` on the function.
     """
 
-    def decorator(func: Callable[P, Tv]) -> Callable[P, Tv]:
+    def decorator(func: Callable[P, Tv]) -> CachedFunction[P, Tv]:
         cache = LRUCache[str, tuple[datetime.datetime, Tv]](capacity)
 
         @functools.wraps(func)
@@ -88,7 +150,9 @@ def cache_result(num_seconds: float, capacity: int = 2**16) -> Callable[[Callabl
             cache[key] = (cur_time, result)
             return result
 
-        return wrapper
+        cached = cast(CachedFunction[P, Tv], wrapper)
+        cached.cache_clear = cache.clear
+        return cached
 
     return decorator
 
@@ -96,7 +160,7 @@ def cache_result(num_seconds: float, capacity: int = 2**16) -> Callable[[Callabl
 def cache_async_result(
     num_seconds: float,
     capacity: int = 2**16,
-) -> Callable[[Callable[P, Awaitable[Tv]]], Callable[P, Awaitable[Tv]]]:
+) -> Callable[[Callable[P, Awaitable[Tv]]], CachedAsyncFunction[P, Tv]]:
     """Cache the result of an async function for a certain number of seconds.
 
     Usage:
@@ -112,10 +176,11 @@ def cache_async_result(
         capacity: The number of results to cache.
 
     Returns:
-        A decorator that caches the result of the function.
+        A decorator that caches the result of the function. The cached
+        results can be dropped by calling ``cache_clear`` on the function.
     """
 
-    def decorator(func: Callable[P, Awaitable[Tv]]) -> Callable[P, Awaitable[Tv]]:
+    def decorator(func: Callable[P, Awaitable[Tv]]) -> CachedAsyncFunction[P, Tv]:
         cache = LRUCache[str, tuple[datetime.datetime, Tv]](capacity)
 
         @functools.wraps(func)
@@ -130,6 +195,8 @@ def cache_async_result(
             cache[key] = (cur_time, result)
             return result
 
-        return wrapper
+        cached = cast(CachedAsyncFunction[P, Tv], wrapper)
+        cached.cache_clear = cache.clear
+        return cached
 
     return decorator
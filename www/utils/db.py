@@ -1,27 +1,28 @@
 """Defines some common utility functions for the database."""
 
 import datetime
-import hashlib
 import re
-import uuid
+import secrets
 from dataclasses import dataclass
 
 
 def server_time() -> datetime.datetime:
-    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
+    return datetime.datetime.now(datetime.UTC)
 
 
 def new_uuid() -> str:
     """Generate a new UUID.
 
     Returns:
-        A new UUID, as a string, with the first 16 characters of the
-        SHA-256 hash of a UUID4 value.
+        A new UUID, as a string of 16 random hex characters.
     """
-    return hashlib.sha256(str(uuid.uuid4()).encode()).hexdigest()[:16]
+    return secrets.token_hex(8)
 
 
-@dataclass
+VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)")
+
+
+@dataclass(frozen=True, slots=True, order=True)
 class VersionNumber:
     major: int
     minor: int
@@ -30,24 +31,14 @@ class VersionNumber:
     def __str__(self) -> str:
         return f"{self.major}.{self.minor}.{self.patch}"
 
-    def __lt__(self, other: "VersionNumber") -> bool:
-        return (self.major, self.minor, self.patch) < (other.major, other.minor, other.patch)
-
-    def __le__(self, other: "VersionNumber") -> bool:
-        return (self.major, self.minor, self.patch) <= (other.major, other.minor, other.patch)
-
-    def __gt__(self, other: "VersionNumber") -> bool:
-        return (self.major, self.minor, self.patch) > (other.major, other.minor, other.patch)
-
-    def __ge__(self, other: "VersionNumber") -> bool:
-        return (self.major, self.minor, self.patch) >= (other.major, other.minor, other.patch)
-
-    def __repr__(self) -> str:
-        return f"VersionNumber(major={self.major}, minor={self.minor}, patch={self.patch})"
-
     @classmethod
     def from_str(cls, version: str) -> "VersionNumber":
-        match = re.match(r"(\d+)\.(\d+)\.(\d+)", version)
+        # Fast path for plain "X.Y.Z" strings; anything else (suffixes like
+        # "-beta", or malformed input) goes through the regex.
+        parts = version.split(".", 2)
+        if len(parts) == 3 and version.isascii() and all(part.isdigit() for part in parts):
+            return cls(major=int(parts[0]), minor=int(parts[1]), patch=int(parts[2]))
+        match = VERSION_RE.match(version)
         if match is None:
             raise ValueError(f"Invalid version number: {version}")
         return cls(major=int(match.group(1)), minor=int(match.group(2)), patch=int(match.group(3)))
@@ -2,10 +2,15 @@
 
 import argparse
 import asyncio
+import functools
 import logging
 import textwrap
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from typing import AsyncIterator, Sequence
 
 import aiosmtplib
 
@@ -13,21 +18,187 @@ from www.settings import env
 
 logger = logging.getLogger(__name__)
 
+# Idle connections are checked with a NOOP before being reused.
+SMTP_KEEPALIVE_SECONDS = 30
 
-async def send_email(subject: str, body: str, to: str) -> None:
+DELETE_EMAIL_BODY = textwrap.dedent(
+    """
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <h1 style="color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px;">K-Scale Labs</h1>
+        <h2 style="color: #666;">Your account has been deleted</h2>
+        <p style="color: #444; line-height: 1.6;">
+            We're sorry to see you go. Your account and associated data have been successfully deleted from our
+            system.
+        </p>
+        <p style="color: #444; line-height: 1.6;">
+            If you have any questions or if this was done in error, please contact our support team.
+        </p>
+        <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee; color: #666; font-size: 12px;">
+            <p>This is an automated message, please do not reply directly to this email.</p>
+        </div>
+    </div>
+    """
+)
+
+SIGNUP_EMAIL_BODY = textwrap.dedent(
+    """
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <h1 style="color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px;">K-Scale Labs</h1>
+        <h2 style="color: #666;">Welcome to K-Scale Labs!</h2>
+        <p style="color: #444; line-height: 1.6;">
+            Thank you for joining our community. Your account has been successfully created using OAuth
+            authentication.
+        </p>
+        <p style="color: #444; line-height: 1.6;">
+            We're excited to have you on board and look forward to helping you make the most of our services.
+        </p>
+        <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee; color: #666; font-size: 12px;">
+            <p>This is an automated message, please do not reply directly to this email.</p>
+        </div>
+    </div>
+    """
+)
+
+
+@functools.cache
+def _from_header() -> str:
+    return f"{env.email.sender_name} <{env.email.sender_email}>"
+
+
+class SMTPPool:
+    """Keeps a single authenticated SMTP connection open between sends.
+
+    Sends are serialized on the connection, so that each message only pays
+    for the MAIL FROM / RCPT TO / DATA round-trips rather than a full
+    connect, TLS and login handshake.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.__client: aiosmtplib.SMTP | None = None
+        self.__lock = asyncio.Lock()
+        self.__last_used = 0.0
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(hostname=env.email.host, port=env.email.port)
+        await client.connect()
+        await client.login(env.email.username, env.email.password)
+        return client
+
+    async def _get_client(self) -> aiosmtplib.SMTP:
+        client = self.__client
+        if client is not None and client.is_connected:
+            if time.monotonic() - self.__last_used < SMTP_KEEPALIVE_SECONDS:
+                return client
+            try:
+                await client.noop()
+                return client
+            except aiosmtplib.SMTPException:
+                logger.info("Idle SMTP connection was closed; reconnecting")
+                self._discard(client)
+        self.__client = client = await self._connect()
+        return client
+
+    @staticmethod
+    def _discard(client: aiosmtplib.SMTP) -> None:
+        # Closes the transport of a connection which is no longer usable.
+        with suppress(Exception):
+            client.close()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        async with self.__lock:
+            client = await self._get_client()
+            try:
+                yield client
+            except aiosmtplib.SMTPServerDisconnected:
+                self.__client = None
+                self._discard(client)
+                raise
+            self.__last_used = time.monotonic()
+
+    async def close(self) -> None:
+        async with self.__lock:
+            client, self.__client = self.__client, None
+            if client is not None and client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+
+
+smtp_pool = SMTPPool()
+
+
+def _build_message(subject: str, body: str, to: str) -> str:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
-    msg["From"] = f"{env.email.sender_name} <{env.email.sender_email}>"
+    msg["From"] = _from_header()
     msg["To"] = to
 
     msg.attach(MIMEText(body, "html"))
+    return msg.as_string()
 
-    smtp_client = aiosmtplib.SMTP(hostname=env.email.host, port=env.email.port)
 
-    await smtp_client.connect()
-    await smtp_client.login(env.email.username, env.email.password)
-    await smtp_client.sendmail(env.email.sender_email, to, msg.as_string())
-    await smtp_client.quit()
+async def send_email(subject: str, body: str, to: str) -> None:
+    if failures := await send_emails([(subject, body, to)]):
+        raise failures[0][1]
+
+
+async def send_emails(messages: Sequence[tuple[str, str, str]]) -> list[tuple[str, aiosmtplib.SMTPException]]:
+    """Sends a batch of emails over a single SMTP session.
+
+    A message which fails, such as when the server refuses its recipient,
+    doesn't stop the rest of the batch from being sent. Messages are
+    delivered at most once: if the connection drops after a message's DATA
+    was issued, the server may have accepted it, so it is reported as failed
+    rather than being resent. Messages whose connection dropped before then
+    are retried once on a new connection.
+
+    Args:
+        messages: The ``(subject, body, to)`` tuples to send.
+
+    Returns:
+        The recipients of the messages which could not be sent, with the
+        error for each.
+    """
+    pending = deque((to, _build_message(subject, body, to)) for subject, body, to in messages)
+    failures: list[tuple[str, aiosmtplib.SMTPException]] = []
+    in_data = False
+    retried = False
+
+    async def send_pending() -> None:
+        nonlocal in_data, retried
+        async with smtp_pool.acquire() as smtp_client:
+            while pending:
+                to, message = pending[0]
+                try:
+                    await smtp_client.mail(env.email.sender_email)
+                    await smtp_client.rcpt(to)
+                    in_data = True
+                    await smtp_client.data(message)
+                except aiosmtplib.SMTPResponseException as e:
+                    failures.append((to, e))
+                    with suppress(aiosmtplib.SMTPException):
+                        await smtp_client.rset()
+                in_data = retried = False
+                pending.popleft()
+
+    while pending:
+        try:
+            await send_pending()
+        except aiosmtplib.SMTPServerDisconnected as e:
+            # The connection may be dropped when the pool still thinks it's
+            # open, so the message is retried once on a new connection,
+            # unless the server may already have accepted it.
+            if in_data or retried:
+                failures.append((pending.popleft()[0], e))
+                in_data = retried = False
+            else:
+                retried = True
+
+    return failures
 
 
 async def send_delete_email(email: str) -> None:
@@ -36,25 +207,7 @@ async def send_delete_email(email: str) -> None:
     Args:
         email: The email address of the user whose account was deleted.
     """
-    body = textwrap.dedent(
-        """
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h1 style="color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px;">K-Scale Labs</h1>
-            <h2 style="color: #666;">Your account has been deleted</h2>
-            <p style="color: #444; line-height: 1.6;">
-                We're sorry to see you go. Your account and associated data have been successfully deleted from our
-                system.
-            </p>
-            <p style="color: #444; line-height: 1.6;">
-                If you have any questions or if this was done in error, please contact our support team.
-            </p>
-            <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee; color: #666; font-size: 12px;">
-                <p>This is an automated message, please do not reply directly to this email.</p>
-            </div>
-        </div>
-        """
-    )
-    await send_email(subject="Account Deleted - K-Scale Labs", body=body, to=email)
+    await send_email(subject="Account Deleted - K-Scale Labs", body=DELETE_EMAIL_BODY, to=email)
 
 
 async def send_signup_notification_email(email: str) -> None:
@@ -63,25 +216,7 @@ async def send_signup_notification_email(email: str) -> None:
     Args:
         email: The email address of the newly registered user.
     """
-    body = textwrap.dedent(
-        """
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h1 style="color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px;">K-Scale Labs</h1>
-            <h2 style="color: #666;">Welcome to K-Scale Labs!</h2>
-            <p style="color: #444; line-height: 1.6;">
-                Thank you for joining our community. Your account has been successfully created using OAuth
-                authentication.
-            </p>
-            <p style="color: #444; line-height: 1.6;">
-                We're excited to have you on board and look forward to helping you make the most of our services.
-            </p>
-            <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee; color: #666; font-size: 12px;">
-                <p>This is an automated message, please do not reply directly to this email.</p>
-            </div>
-        </div>
-        """
-    )
-    await send_email(subject="Welcome to K-Scale Labs", body=body, to=email)
+    await send_email(subject="Welcome to K-Scale Labs", body=SIGNUP_EMAIL_BODY, to=email)
 
 
 def test_email_adhoc() -> None:
@@ -91,7 +226,13 @@ def test_email_adhoc() -> None:
     parser.add_argument("to", help="The recipient of the email.")
     args = parser.parse_args()
 
-    asyncio.run(send_email(args.subject, args.body, args.to))
+    async def main() -> None:
+        try:
+            await send_email(args.subject, args.body, args.to)
+        finally:
+            await smtp_pool.close()
+
+    asyncio.run(main())
 
 
 if __name__ == "__main__":